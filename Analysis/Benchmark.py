@@ -0,0 +1,99 @@
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import gaussian_kde
+
+from Entities.FirmSelection import FactorMode, FirmSelection
+from Entities.KernelDensity import KernelDensity
+from Entities.RollingEstimation import RollingEstimation
+
+FACTOR_NAMES = ["SMB", "HMS", "RMW", "CMA"]
+
+
+def _timings(func, repeats: int) -> tuple[list[float], object]:
+    timings = []
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def benchmark_factor_modes(selection: FirmSelection, repeats: int = 5) -> pd.DataFrame:
+    # factor construction time of every FactorMode and how close its factors are to the static ones
+    rows = {}
+    static = None
+    for factor_mode in FactorMode:
+        timings, factors = _timings(lambda: selection.factor_returns(factor_mode=factor_mode), repeats=repeats)
+        factors = pd.concat(factors, axis=1, keys=FACTOR_NAMES)
+        if static is None:
+            static = factors
+        rows[factor_mode.value] = {
+            "best_seconds": min(timings),
+            "median_seconds": float(np.median(timings)),
+            "days": len(factors.dropna(axis="index", how="any")),
+        } | {f"{name}_corr_static": factors[name].corr(static[name]) for name in FACTOR_NAMES}
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def benchmark_estimation_window(
+    selection: FirmSelection,
+    dates: list,
+    estimation_window: tuple[int, int] = (250, 30),
+    repeats: int = 1,
+) -> pd.DataFrame:
+    # rolling cross product updates against one least squares refit per event and firm, per return type
+    estimation_days, gap_days = estimation_window
+    rows = {}
+    for result_name, name in FirmSelection.ZSCORE_TESTS.items():
+        index, y, columns = selection.estimation_inputs(name)
+        event_rows = index.get_indexer(pd.DatetimeIndex(dates).unique())
+        event_rows = event_rows[0 <= event_rows]
+        inputs = {"y": y, "columns": columns, "event_rows": event_rows, "estimation_days": estimation_days, "gap_days": gap_days}
+        rolling_timings, rolling = _timings(lambda: RollingEstimation.zscores(**inputs), repeats=repeats)
+        refit_timings, refit = _timings(lambda: RollingEstimation.refit_zscores(**inputs), repeats=repeats)
+        rows[result_name] = {
+            "events": len(event_rows),
+            "firms": y.shape[1],
+            "rolling_seconds": min(rolling_timings),
+            "refit_seconds": min(refit_timings),
+            "speedup": min(refit_timings) / min(rolling_timings),
+            "max_abs_diff": float(np.nanmax(np.abs(rolling - refit), initial=0.0)),
+            "same_fits": bool(np.array_equal(np.isnan(rolling), np.isnan(refit))),
+        }
+    return pd.DataFrame.from_dict(rows, orient="index")
+
+
+def benchmark_kernel_density(
+    returns: np.ndarray,
+    x: np.ndarray | None = None,
+    bw_methods: list = None,
+    sizes: list[int] | None = None,
+    repeats: int = 3,
+    seed: int = 0,
+) -> pd.DataFrame:
+    # binned FFT density against scipy's gaussian_kde on random subsamples of the returns, per bandwidth and sample size
+    if x is None:
+        x = np.linspace(-3, 3, 2000)
+    if bw_methods is None:
+        bw_methods = [1.0, "scott", "silverman"]
+    returns = returns[~np.isnan(returns)]
+    if sizes is None:
+        sizes = [min(10_000, len(returns)), len(returns)]
+    rng = np.random.default_rng(seed)
+    rows = {}
+    for size in sizes:
+        values = rng.choice(returns, size=size, replace=False)
+        for bw_method in bw_methods:
+            binned_timings, binned = _timings(lambda: KernelDensity.evaluate(values, x, bw_method=bw_method), repeats=repeats)
+            exact_timings, exact = _timings(lambda: gaussian_kde(values, bw_method=bw_method)(x), repeats=repeats)
+            rows[(size, bw_method)] = {
+                "binned_seconds": min(binned_timings),
+                "gaussian_kde_seconds": min(exact_timings),
+                "speedup": min(exact_timings) / min(binned_timings),
+                "max_abs_diff": float(np.max(np.abs(binned - exact))),
+                "max_rel_diff_to_peak": float(np.max(np.abs(binned - exact)) / np.max(exact)),
+            }
+    return pd.DataFrame.from_dict(rows, orient="index").rename_axis(["values", "bw_method"])
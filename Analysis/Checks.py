@@ -0,0 +1,28 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from data_managemant.LSEGDownloader import LSEGDataDownloader
+
+
+def check_total_return_split(start_date: datetime = datetime(2024, 1, 1), end_date: datetime = datetime(2024, 1, 12)) -> bool:
+    # a chunk response with gaps split per RIC has to give the frames of the single RIC downloads,
+    # missing trading days stay NaN and a RIC without any value gives None
+    dates = pd.bdate_range(start_date, end_date, name="Date")
+    rng = np.random.default_rng(0)
+    chunk = pd.DataFrame({ric: rng.normal(0, 1, len(dates)) for ric in ["A.X", "B.X", "C.X"]}, index=dates)
+    chunk.loc[dates[0], "A.X"] = np.nan
+    chunk.loc[dates[3:5], "B.X"] = np.nan
+    chunk.loc[:, "C.X"] = np.nan
+    bulk = LSEGDataDownloader._split_total_returns(chunk, list(chunk.columns), start_date=start_date, end_date=end_date)
+    for ric in ["A.X", "B.X"]:
+        single = LSEGDataDownloader._format_total_return(
+            chunk[[ric]].rename(columns={ric: "Total Return"}),
+            start_date=start_date,
+            end_date=end_date,
+        )
+        pd.testing.assert_frame_equal(bulk[ric], single)
+    if bulk["C.X"] is not None:
+        raise AssertionError("a RIC without any total return in the chunk has to give None")
+    return True
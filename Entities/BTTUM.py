@@ -1,4 +1,5 @@
 import os
+import time
 from datetime import datetime
 
 import numpy as np
@@ -6,11 +7,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from scipy.integrate import simpson
-from scipy.stats import gaussian_kde
 
 from Entities.Country import Country
 from Entities.Firm import Firm
-from Entities.FirmSelection import FirmSelection
+from Entities.FirmSelection import FactorMode, FirmSelection
+from Entities.KernelDensity import KernelDensity
 from data_managemant.CountryCodes import COUNTRY
 from data_managemant.DataLoader import DataLoader
 from data_managemant.FileManager import FileManager
@@ -28,13 +29,17 @@ class BTTUM:
         use_dead_list: bool = True,
         min_num_firms: int = 5,
         print_loading=True,
+        lseg_backend=None,
+        offline: bool = False,
+        n_workers: int = 1,
+        factor_mode: FactorMode = FactorMode.STATIC,
     ):
         self.country_codes: list[COUNTRY] = country_codes
         self.interval_daily_returns: tuple[datetime, datetime] = interval_daily_returns
         self.interval_esg: tuple[int, int] = interval_esg
         self.use_dead_list: bool = use_dead_list
 
-        self.data_loader = DataLoader(print_stuff=print_loading)
+        self.data_loader = DataLoader(print_stuff=print_loading, lseg_backend=lseg_backend, offline=offline)
         self.all_firms: list[Firm] = []
 
         self.countries: dict[COUNTRY, Country] = {}
@@ -42,6 +47,10 @@ class BTTUM:
         self.country_esg_tests: dict[str, pd.DataFrame] = {}
 
         for country_code in self.country_codes:
+            if offline and not self.data_loader.has_country_returns(country_code=country_code, interval_daily_returns=self.interval_daily_returns):
+                # the missing risk free or market return is in the missing report
+                print(f"SKIP {country_code.value} since its risk free or market return is not cached")
+                continue
             self.countries[country_code] = Country(
                 data_loader=self.data_loader,
                 country_code=country_code,
@@ -49,17 +58,22 @@ class BTTUM:
                 interval_esg=self.interval_esg,
                 use_dead_list=self.use_dead_list,
                 min_num_days=0.1,
+                n_workers=n_workers,
+                factor_mode=factor_mode,
             )
             self.all_firms.extend(self.countries[country_code].firms.values())
+        if offline:
+            self.data_loader.print_missing_report()
         self.broad_industries: dict[str, FirmSelection] = {}
         self.broad_industry_return_tests: dict[str, dict[str, pd.DataFrame]] = {}
         self.broad_industry_esg_tests: dict[str, pd.DataFrame] = {}
+        self.event_tests: pd.DataFrame | None = None
         self.all_broad_industries = sorted({firm.broad_industry for firm in self.all_firms if not pd.isna(firm.industry)})
         for broad_industry in self.all_broad_industries:
             firms = {firm.ric: firm for firm in self.all_firms if firm.broad_industry == broad_industry}
             if min_num_firms <= len(firms):
                 print(f"CALC {broad_industry} with {len(firms)} firms")
-                self.broad_industries[broad_industry] = FirmSelection(firms=firms, name=broad_industry)
+                self.broad_industries[broad_industry] = FirmSelection(firms=firms, name=broad_industry, factor_mode=factor_mode)
             else:
                 print(f"SKIP {broad_industry} since length is only {len(firms)}")
         print()
@@ -173,6 +187,39 @@ class BTTUM:
         if plot_esg:
             self.plot_esg(check_ret_dates=check_esg_years)
 
+    def execute_events(
+        self,
+        events: pd.DataFrame,
+        z_score_limits: list[float] = None,
+        write_excel: bool = True,
+    ) -> pd.DataFrame:
+        # events: "event_id" with a "date" per row or a "start_date" / "end_date" window, tested on every country and broad industry
+        print("Execute events")
+        selections: dict[tuple[str, str], FirmSelection] = {("country", country_code.value): country for country_code, country in self.countries.items()}
+        selections |= {("broad_industry", name): broad_industry for name, broad_industry in self.broad_industries.items()}
+        start = time.perf_counter()
+        self.event_tests = pd.concat(
+            {key: selection.test_events(events=events, z_score_limits=z_score_limits) for key, selection in selections.items()},
+            axis="rows",
+            names=["selection_type", "selection"],
+        )
+        duration = time.perf_counter() - start
+        # events without a tested day in any selection (e.g. an end before the start) do not count
+        days = self.event_tests["days"]
+        num_events = days[0 < days].index.get_level_values("event_id").nunique()
+        print(f"Tested {num_events} events on {len(selections)} selections in {duration:.2f}s ({num_events / duration:,.1f} events/s)")
+
+        if write_excel:
+            FileManager.write_excel_results(
+                f"{'_'.join([cc.value for cc in self.country_codes])}\\"
+                f"TEST_EVENTS"
+                f"__{min(self.interval_daily_returns).strftime('%Y-%m-%d')}"
+                f"_{max(self.interval_daily_returns).strftime('%Y-%m-%d')}"
+                f"__{num_events}_EVENTS",
+                {"events": self.event_tests},
+            )
+        return self.event_tests
+
     def plot_return_distribution(self):
         # Assuming self.all_firms is already defined and each has .daily_returns
         returns = np.concatenate(
@@ -184,9 +231,8 @@ class BTTUM:
         returns = returns[returns != 0]
 
         # KDE
-        kde = gaussian_kde(returns, bw_method=1.0)
         x = np.linspace(-3, 3, 2000)
-        y = kde(x)
+        y = KernelDensity.evaluate(returns, x, bw_method=1.0)
         print("Return Distribution: area under the KDE curve:", simpson(y, x))
 
         # Create plotly figure
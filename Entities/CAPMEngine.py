@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+class CAPMEngine:
+    def __init__(
+        self,
+        risk_free_rate: pd.Series,
+        market_returns: pd.Series,
+        total_returns: dict[str, pd.Series],
+    ):
+        # all firms of one country on the shared risk free / market date axis, one column per firm
+        self.rics: list[str] = list(total_returns.keys())
+        self.positions: dict[str, int] = {ric: i for i, ric in enumerate(self.rics)}
+        rf_dates = risk_free_rate.index.to_numpy(dtype="datetime64[ns]")
+        mr_dates = market_returns.index.to_numpy(dtype="datetime64[ns]")
+        self.dates = np.intersect1d(rf_dates, mr_dates)
+        rf = risk_free_rate.to_numpy(dtype=np.float64)[pd.Index(rf_dates).get_indexer(self.dates)]
+        mr = market_returns.to_numpy(dtype=np.float64)[pd.Index(mr_dates).get_indexer(self.dates)]
+        # an inner join only keeps the index name all three inputs agree on
+        self.index_names = [
+            series.index.name if series.index.name == risk_free_rate.index.name == market_returns.index.name else None
+            for series in total_returns.values()
+        ]
+
+        self.returns = np.full((len(self.dates), len(self.rics)), np.nan, dtype=np.float64, order="F")
+        for i, series in enumerate(total_returns.values()):
+            dates = series.index.to_numpy(dtype="datetime64[ns]")
+            rows = np.searchsorted(self.dates, dates)
+            found = rows < len(self.dates)
+            found[found] = self.dates[rows[found]] == dates[found]
+            self.returns[rows[found], i] = series.to_numpy(dtype=np.float64)[found]
+
+        # same rows as the inner join of stock, risk free and market returns without NaN and all zero rows
+        all_zero = (self.returns == 0) & ((rf == 0) & (mr == 0))[:, None]
+        self.valid = ~np.isnan(self.returns) & (~np.isnan(rf) & ~np.isnan(mr))[:, None] & ~all_zero
+        self.excess_returns = self.returns - rf[:, None]
+        self.market_excess_returns = mr - rf
+        self.rows: list[np.ndarray] = [np.flatnonzero(self.valid[:, i]) for i in range(len(self.rics))]
+        self.counts = np.array([len(rows) for rows in self.rows], dtype=np.int64)
+
+        self.mean = np.full(len(self.rics), np.nan)
+        self.median = np.full(len(self.rics), np.nan)
+        self.var = np.full(len(self.rics), np.nan)
+        self.vol = np.full(len(self.rics), np.nan)
+        self.market_var = np.full(len(self.rics), np.nan)
+        self.cov = np.full(len(self.rics), np.nan)
+        # firms with the same number of days share one (firms x days) block, reduced along its contiguous rows
+        # so every sum runs through the same pairwise summation as the per firm pandas statistics
+        for n in np.unique(self.counts):
+            firms = np.flatnonzero(self.counts == n)
+            if n == 0:
+                continue
+            rows = np.stack([self.rows[i] for i in firms])
+            returns = self.returns[rows, firms[:, None]]
+            self.mean[firms] = returns.sum(axis=1) / np.float64(n)
+            self.median[firms] = np.median(returns, axis=1)
+            if n < 2:
+                continue
+            self.var[firms] = CAPMEngine._var(returns, n)
+            self.vol[firms] = np.sqrt(self.var[firms])
+            self.market_var[firms] = CAPMEngine._var(self.market_excess_returns[rows], n)
+            stock_premiums = self.excess_returns[rows, firms[:, None]]
+            market_premiums = self.market_excess_returns[rows]
+            for j, i in enumerate(firms):
+                self.cov[i] = np.cov(stock_premiums[j], market_premiums[j], ddof=1)[0, 1]
+        self.beta = self.cov / self.market_var
+        self.abnormal_returns = self.excess_returns - self.beta[None, :] * self.market_excess_returns[:, None]
+
+    @staticmethod
+    def _var(values: np.ndarray, n: int) -> np.ndarray:
+        avg = values.sum(axis=1, dtype=np.float64) / np.float64(n)
+        sqr = (avg[:, None] - values) ** 2
+        return sqr.sum(axis=1, dtype=np.float64) / np.float64(n - 1)
+
+    def __contains__(self, RIC: str) -> bool:
+        return RIC in self.positions
+
+    def _series(self, RIC: str, values: np.ndarray, name: str | None) -> pd.Series:
+        i = self.positions[RIC]
+        rows = self.rows[i]
+        return pd.Series(values[rows], index=pd.DatetimeIndex(self.dates[rows], name=self.index_names[i]), name=name)
+
+    def daily_returns(self, RIC: str) -> pd.Series:
+        return self._series(RIC, self.returns[:, self.positions[RIC]], "total_return")
+
+    def stock_premiums(self, RIC: str) -> pd.Series:
+        return self._series(RIC, self.excess_returns[:, self.positions[RIC]], "SP")
+
+    def market_premiums(self, RIC: str) -> pd.Series:
+        return self._series(RIC, self.market_excess_returns, "MP")
+
+    def capm_returns(self, RIC: str) -> pd.Series:
+        return self._series(RIC, self.abnormal_returns[:, self.positions[RIC]], None)
+
+    def statistics(self, RIC: str) -> dict[str, float]:
+        i = self.positions[RIC]
+        return {
+            "mean_return": self.mean[i],
+            "median_return": self.median[i],
+            "vol_return": self.vol[i],
+            "var_return": self.var[i],
+            "beta": self.beta[i],
+        }
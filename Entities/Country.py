@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from Entities.FirmSelection import FirmSelection
+from Entities.FirmSelection import FactorMode, FirmSelection
 from data_managemant.CountryCodes import COUNTRY
 from data_managemant.DataLoader import DataLoader
 
@@ -15,6 +15,8 @@ class Country(FirmSelection):
         min_num_days: int | float = None,
         use_dead_list: bool = False,
         print_stuff: bool = True,
+        n_workers: int = 1,
+        factor_mode: FactorMode = FactorMode.STATIC,
     ):
         self.country_code = country_code
         self.print_stuff = print_stuff
@@ -23,17 +25,31 @@ class Country(FirmSelection):
             dead_date=min(interval_daily_returns),
             use_dead_list=use_dead_list,
         )
-        firms = {}
-        for i, ric in enumerate(country_rics):
-            if print_stuff:
-                print(
-                    f"{country_code.value+":":<4} {ric:<20} Load {i+1:<4.0f}/{len(country_rics):<4.0f} [{(i+1)/len(country_rics)*100:>6.2f}%]",
-                )
-            firms[ric] = data_loader.get_firm(
+        data_loader.prefetch_fundamentals(country_code=self.country_code, RICs=country_rics.to_list())
+        data_loader.prefetch_esg_data(country_code=self.country_code, RICs=country_rics.to_list())
+        data_loader.get_return_panel(
+            country_code=self.country_code,
+            RICs=country_rics.to_list(),
+            start_date=min(interval_daily_returns),
+            end_date=max(interval_daily_returns),
+        )
+        if 1 < n_workers:
+            firms = data_loader.get_firms_parallel(
+                country_code=self.country_code,
+                RICs=country_rics.to_list(),
+                interval_daily_returns=interval_daily_returns,
+                interval_esg=interval_esg,
+                min_num_days=min_num_days,
+                n_workers=n_workers,
+                print_stuff=print_stuff,
+            )
+        else:
+            firms = data_loader.get_firms(
                 country_code=self.country_code,
-                RIC=ric,
+                RICs=country_rics.to_list(),
                 interval_daily_returns=interval_daily_returns,
                 interval_esg=interval_esg,
                 min_num_days=min_num_days,
+                print_stuff=print_stuff,
             )
-        super().__init__(firms=firms, name=country_code.value)
+        super().__init__(firms=firms, name=country_code.value, factor_mode=factor_mode)
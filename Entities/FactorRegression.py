@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+
+class FactorRegression:
+    FACTORS_3: list[str] = ["MP", "SMB", "HMS"]
+    FACTORS_5: list[str] = ["MP", "SMB", "HMS", "RMW", "CMA"]
+    MAX_CONDITION: float = 1e12
+
+    @staticmethod
+    def fit(
+        stock_premiums: dict[str, pd.Series],
+        market_premiums: dict[str, pd.Series],
+        factors: pd.DataFrame,
+        chunk_size: int = 128,
+    ) -> tuple[pd.DataFrame, pd.DataFrame]:
+        # factors holds SMB, HMS, RMW, CMA; every firm uses the dates it shares with all of them, like the former inner join
+        factors = factors[["SMB", "HMS", "RMW", "CMA"]].dropna(axis="index", how="any").astype(float)
+        dates = factors.index.to_numpy(dtype="datetime64[ns]")
+        factor_values = factors.to_numpy(dtype=np.float64)
+        rics = list(stock_premiums.keys())
+        params3 = np.full((len(rics), 4), np.nan)
+        params5 = np.full((len(rics), 6), np.nan)
+
+        for start in range(0, len(rics), chunk_size):
+            chunk = rics[start : start + chunk_size]
+            # (firms x dates x regressors) design with [const, MP, SMB, HMS, RMW, CMA], rows outside a firm's mask stay zero
+            design = np.zeros((len(chunk), len(dates), 6), dtype=np.float64)
+            y = np.zeros((len(chunk), len(dates)), dtype=np.float64)
+            for i, ric in enumerate(chunk):
+                sp = stock_premiums[ric]
+                mp = market_premiums[ric].reindex(sp.index)
+                rows = np.searchsorted(dates, sp.index.to_numpy(dtype="datetime64[ns]"))
+                found = rows < len(dates)
+                found[found] = dates[rows[found]] == sp.index.to_numpy(dtype="datetime64[ns]")[found]
+                found &= ~np.isnan(mp.to_numpy(dtype=np.float64))
+                rows = rows[found]
+                y[i, rows] = sp.to_numpy(dtype=np.float64)[found]
+                design[i, rows, 0] = 1.0
+                design[i, rows, 1] = mp.to_numpy(dtype=np.float64)[found]
+                design[i, rows, 2:] = factor_values[rows]
+            params5[start : start + len(chunk)] = FactorRegression._fit_chunk(design, y)
+            params3[start : start + len(chunk)] = FactorRegression._fit_chunk(design[:, :, :4], y)
+
+        return (
+            pd.DataFrame(params3, index=rics, columns=["const"] + FactorRegression.FACTORS_3),
+            pd.DataFrame(params5, index=rics, columns=["const"] + FactorRegression.FACTORS_5),
+        )
+
+    @staticmethod
+    def _fit_chunk(design: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # slopes from the normal equations of the per firm demeaned data, the intercept from the means,
+        # which keeps the constant column out of the (otherwise badly conditioned) cross products
+        mask = design[:, :, :1]
+        counts = mask.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_mean = design[:, :, 1:].sum(axis=1) / counts
+            y_mean = y.sum(axis=1) / counts[:, 0]
+        x = (design[:, :, 1:] - x_mean[:, None, :]) * mask
+        x_t = x.transpose(0, 2, 1)
+        xtx = x_t @ x
+        xty = (x_t @ ((y - y_mean[:, None]) * mask[:, :, 0])[:, :, None])[:, :, 0]
+        slopes = FactorRegression._solve(xtx, xty, design, y)
+        params = np.empty((len(y), design.shape[2]))
+        params[:, 0] = y_mean - (x_mean * slopes).sum(axis=1)
+        params[:, 1:] = slopes
+        return params
+
+    @staticmethod
+    def _solve(xtx: np.ndarray, xty: np.ndarray, design: np.ndarray, y: np.ndarray) -> np.ndarray:
+        slopes = np.full(xty.shape, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            well_posed = np.linalg.cond(xtx) < FactorRegression.MAX_CONDITION
+        if well_posed.any():
+            slopes[well_posed] = np.linalg.solve(xtx[well_posed], xty[well_posed][:, :, None])[:, :, 0]
+        # rank deficient firms get the minimum norm solution of the full design, as statsmodels' pinv based OLS would
+        for i in np.flatnonzero(~well_posed):
+            rows = design[i, :, 0] != 0
+            if rows.any():
+                slopes[i] = (np.linalg.pinv(design[i, rows]) @ y[i, rows])[1:]
+        return slopes
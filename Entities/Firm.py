@@ -1,9 +1,12 @@
+import copy
 from datetime import datetime
 
-import numpy as np
 import pandas as pd
 import statsmodels.api as sm
 
+from Entities.CAPMEngine import CAPMEngine
+from Entities.FactorRegression import FactorRegression
+
 
 industry_mapper = {
     "Basic Materials Industry and Construction": "Basic Industry",
@@ -15,6 +18,9 @@ industry_mapper = {
 
 
 class Firm:
+    # return series behind the z-score tests
+    RETURN_SERIES: dict[str, str] = {"ret": "daily_returns", "capm": "capm_returns", "f3": "f3_returns", "f5": "f5_returns"}
+
     def __init__(
         self,
         meta: pd.Series,
@@ -23,6 +29,7 @@ class Firm:
         market_returns: pd.Series,
         df_daily_returns: pd.DataFrame | None,
         df_esg: pd.DataFrame | None,
+        capm_engine: CAPMEngine | None = None,
     ):
         # meta attributes
         self.meta = meta
@@ -50,24 +57,28 @@ class Firm:
         # esg
         self.df_esg = df_esg
 
+        # (mean, std) of the return series, computed on first use
+        self._moments: dict[str, tuple[float, float]] = {}
+
         if df_daily_returns is None:
             self.daily_returns = None
         else:
-            # returns
-            risk_free_rate.name = "risk_free_returns"
-            market_returns.name = "market_returns"
-            returns = pd.concat([df_daily_returns["total_return"], risk_free_rate, market_returns], axis=1, join="inner").dropna(axis=0, how="any")
-            returns = returns.loc[~returns.eq(0).all(axis=1), :]
-            self.daily_returns: pd.Series = returns["total_return"]
-            self.stock_premiums: pd.Series = returns["total_return"] - returns["risk_free_returns"]
-            self.stock_premiums.name = "SP"
-            self.market_premiums = returns["market_returns"] - returns["risk_free_returns"]
-            self.market_premiums.name = "MP"
-
-            self.mean_return: float = self.daily_returns.mean()
-            self.median_return: float = self.daily_returns.median()
-            self.vol_return: float = self.daily_returns.std()
-            self.var_return: float = self.daily_returns.var()
+            # returns, premiums and their statistics come from the country wide engine or one built for this firm alone
+            if capm_engine is None or self.ric not in capm_engine:
+                capm_engine = CAPMEngine(
+                    risk_free_rate=risk_free_rate,
+                    market_returns=market_returns,
+                    total_returns={self.ric: df_daily_returns["total_return"]},
+                )
+            self.daily_returns: pd.Series = capm_engine.daily_returns(self.ric)
+            self.stock_premiums: pd.Series = capm_engine.stock_premiums(self.ric)
+            self.market_premiums = capm_engine.market_premiums(self.ric)
+
+            statistics = capm_engine.statistics(self.ric)
+            self.mean_return: float = statistics["mean_return"]
+            self.median_return: float = statistics["median_return"]
+            self.vol_return: float = statistics["vol_return"]
+            self.var_return: float = statistics["var_return"]
 
             # geometric mean return
             if 0 < len(df_daily_returns):
@@ -76,10 +87,8 @@ class Firm:
                 self.geometric_mean_return: float = 0
 
             # CAPM
-            cov = self.stock_premiums.cov(self.market_premiums)
-            var = self.market_premiums.var()
-            self.beta: float = cov / var
-            self.capm_returns: pd.Series = self.stock_premiums - (self.beta * self.market_premiums)
+            self.beta: float = statistics["beta"]
+            self.capm_returns: pd.Series = capm_engine.capm_returns(self.ric)
 
             # factor categorizer
             self.smb_categorizer = None if fundamentals is None else self.market_capitalization.mean()
@@ -87,45 +96,85 @@ class Firm:
             self.rmw_categorizer = None if fundamentals is None else ((self.op_profit - self.int_exp) / self.book_equity).mean()
             self.cma_categorizer = None if fundamentals is None else self.assets.pct_change().dropna().mean()
 
-            # general factor values
-            self._smb = np.zeros(len(self.stock_premiums))  # small minus big  small cap vs large cap
-            self._hms = np.zeros(len(self.stock_premiums))  # high minus low book_values/market_values
-            self._rmw = np.zeros(len(self.stock_premiums))  # robust vs weak profitability
-            self._cma = np.zeros(len(self.stock_premiums))  # conservative vs aggressive
-
-            # company factor exposures
-            self._alpha3 = 0.0
-            self._beta3_exposure = 0.0
-            self._smb3_exposure = 0.0
-            self._hms3_exposure = 0.0
-            self._alpha5 = 0.0
-            self._beta5_exposure = 0.0
-            self._smb5_exposure = 0.0
-            self._hms5_exposure = 0.0
-            self._rmw5_exposure = 0.0
-            self._cma5_exposure = 0.0
+            # the same categorizers per fiscal year end, for annually rebalanced sorts
+            self.annual_categorizers: pd.DataFrame | None = (
+                None
+                if fundamentals is None
+                else pd.DataFrame(
+                    {
+                        "smb": self.market_capitalization,
+                        "hms": self.book_equity / self.market_capitalization,
+                        "rmw": (self.op_profit - self.int_exp) / self.book_equity,
+                        "cma": self.assets.pct_change(),
+                    },
+                    index=self.fundamentals.index,
+                ).set_axis(pd.Index(self.fundamentals["date"].dt.year, name="year"), axis="index")
+            )
+
+        self._reset_factor_state()
+
+    def _reset_factor_state(self):
+        # selection specific state, the factors, exposures and the residuals derived from them
+        self._residuals: dict[str, pd.Series] = {}
+        self._moments = {name: moments for name, moments in self._moments.items() if name in ["ret", "capm"]}
+        self.ols3_results = None
+        self.ols5_results = None
+        if self.daily_returns is None:
+            return
+
+        # general factor values
+        self._smb = 0.0  # small minus big  small cap vs large cap
+        self._hms = 0.0  # high minus low book_values/market_values
+        self._rmw = 0.0  # robust vs weak profitability
+        self._cma = 0.0  # conservative vs aggressive
+
+        # company factor exposures
+        self._alpha3 = 0.0
+        self._beta3_exposure = 0.0
+        self._smb3_exposure = 0.0
+        self._hms3_exposure = 0.0
+        self._alpha5 = 0.0
+        self._beta5_exposure = 0.0
+        self._smb5_exposure = 0.0
+        self._hms5_exposure = 0.0
+        self._rmw5_exposure = 0.0
+        self._cma5_exposure = 0.0
+
+    def selection_view(self) -> "Firm":
+        # shares meta, fundamentals, esg and return data with this firm, only the factor state is its own
+        view = copy.copy(self)
+        view._reset_factor_state()
+        return view
 
     @property
     def f3_returns(self):
         if self.fundamentals is None or self.daily_returns is None:
             return None
-        f3_explained = self._alpha3 + self._beta3_exposure * self.market_premiums + self._smb3_exposure * self._smb + self._hms3_exposure * self._hms
-        return self.stock_premiums - f3_explained
+        if "f3" not in self._residuals:
+            f3_explained = self._alpha3 + self._beta3_exposure * self.market_premiums + self._smb3_exposure * self._smb + self._hms3_exposure * self._hms
+            self._residuals["f3"] = self.stock_premiums - f3_explained
+        return self._residuals["f3"]
 
     @property
     def f5_returns(self):
         if self.fundamentals is None or self.daily_returns is None:
             return None
-        f5_explained = (
-            self._alpha5
-            + self._beta5_exposure * self.market_premiums
-            + self._smb5_exposure * self._smb
-            + self._hms5_exposure * self._hms
-            + self._rmw5_exposure * self._rmw
-            + self._cma5_exposure * self._cma
-        )
+        if "f5" not in self._residuals:
+            f5_explained = (
+                self._alpha5
+                + self._beta5_exposure * self.market_premiums
+                + self._smb5_exposure * self._smb
+                + self._hms5_exposure * self._hms
+                + self._rmw5_exposure * self._rmw
+                + self._cma5_exposure * self._cma
+            )
+            self._residuals["f5"] = self.stock_premiums - f5_explained
+        return self._residuals["f5"]
 
-        return self.stock_premiums - f5_explained
+    def _clear_factor_cache(self):
+        for name in ["f3", "f5"]:
+            self._residuals.pop(name, None)
+            self._moments.pop(name, None)
 
     def set_factors(
         self,
@@ -133,9 +182,20 @@ class Firm:
         hms: pd.Series,
         rmw: pd.Series,
         cma: pd.Series,
+        inference: bool = False,
     ):
         if self.fundamentals is None or self.daily_returns is None:
             return
+        if not inference:
+            params3, params5 = FactorRegression.fit(
+                stock_premiums={self.ric: self.stock_premiums},
+                market_premiums={self.ric: self.market_premiums},
+                factors=pd.concat([smb.rename("SMB"), hms.rename("HMS"), rmw.rename("RMW"), cma.rename("CMA")], axis=1, join="inner"),
+            )
+            self.set_factor_exposures(smb=smb, hms=hms, rmw=rmw, cma=cma, params3=params3.loc[self.ric], params5=params5.loc[self.ric])
+            return
+
+        # full statsmodels fit, keeps the results for their inference output
         self._smb = smb
         self._smb.name = "SMB"
         self._hms = hms
@@ -157,42 +217,73 @@ class Firm:
             axis=1,
             join="inner",
         ).astype(float)
-        res3 = sm.OLS(
+        self.ols3_results = sm.OLS(
             ols["SP"],
             sm.add_constant(ols[["MP", "SMB", "HMS"]].copy()),
         ).fit()
-        self._alpha3 = res3.params["const"]
-        self._beta3_exposure = res3.params["MP"]
-        self._smb3_exposure = res3.params["SMB"]
-        self._hms3_exposure = res3.params["HMS"]
-
-        res5 = sm.OLS(
+        self.ols5_results = sm.OLS(
             ols["SP"],
             sm.add_constant(ols[["MP", "SMB", "HMS", "RMW", "CMA"]].copy()),
         ).fit()
-        self._alpha5 = res5.params["const"]
-        self._beta5_exposure = res5.params["MP"]
-        self._smb5_exposure = res5.params["SMB"]
-        self._hms5_exposure = res5.params["HMS"]
-        self._rmw5_exposure = res5.params["RMW"]
-        self._cma5_exposure = res5.params["CMA"]
-
-    @staticmethod
-    def _zscore(returns: pd.Series, dates: list[datetime]) -> pd.Series:
+        self.set_factor_exposures(smb=smb, hms=hms, rmw=rmw, cma=cma, params3=self.ols3_results.params, params5=self.ols5_results.params)
+
+    def set_factor_exposures(
+        self,
+        smb: pd.Series,
+        hms: pd.Series,
+        rmw: pd.Series,
+        cma: pd.Series,
+        params3: pd.Series,
+        params5: pd.Series,
+    ):
+        if self.fundamentals is None or self.daily_returns is None:
+            return
+        self._clear_factor_cache()
+        self._smb = smb
+        self._smb.name = "SMB"
+        self._hms = hms
+        self._hms.name = "HMS"
+        self._rmw = rmw
+        self._rmw.name = "RMW"
+        self._cma = cma
+        self._cma.name = "CMA"
+
+        self._alpha3 = params3["const"]
+        self._beta3_exposure = params3["MP"]
+        self._smb3_exposure = params3["SMB"]
+        self._hms3_exposure = params3["HMS"]
+
+        self._alpha5 = params5["const"]
+        self._beta5_exposure = params5["MP"]
+        self._smb5_exposure = params5["SMB"]
+        self._hms5_exposure = params5["HMS"]
+        self._rmw5_exposure = params5["RMW"]
+        self._cma5_exposure = params5["CMA"]
+
+    def return_series(self, name: str) -> pd.Series:
+        return getattr(self, Firm.RETURN_SERIES[name])
+
+    def moments(self, name: str) -> tuple[float, float]:
+        if name not in self._moments:
+            returns = self.return_series(name)
+            self._moments[name] = (returns.mean(), returns.std())
+        return self._moments[name]
+
+    def _zscore(self, name: str, dates: list[datetime]) -> pd.Series:
+        returns = self.return_series(name)
+        mean, std = self.moments(name)
         dates = returns.index.intersection(dates)
         x = returns.loc[dates]
-        mean = returns.mean()
-        std = returns.std()
         return (x - mean) / std
 
     def ret_zscore(self, dates: list[datetime]) -> pd.Series:
-        return self._zscore(returns=self.daily_returns, dates=dates)
+        return self._zscore(name="ret", dates=dates)
 
     def capm_zscore(self, dates: list[datetime]) -> pd.Series:
-        return self._zscore(returns=self.capm_returns, dates=dates)
+        return self._zscore(name="capm", dates=dates)
 
     def f3_zscore(self, dates: list[datetime]) -> pd.Series:
-        return self._zscore(returns=self.f3_returns, dates=dates)
+        return self._zscore(name="f3", dates=dates)
 
     def f5_zscore(self, dates: list[datetime]) -> pd.Series:
-        return self._zscore(returns=self.f5_returns, dates=dates)
+        return self._zscore(name="f5", dates=dates)
@@ -1,21 +1,44 @@
-import copy
+import warnings
 from datetime import datetime
+from enum import Enum
 
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from scipy.integrate import simpson
-from scipy.stats import gaussian_kde, norm
+from scipy.stats import norm, rankdata
 
 
+from Entities.FactorRegression import FactorRegression
 from Entities.Firm import Firm
+from Entities.KernelDensity import KernelDensity
+from Entities.ResamplingNull import ResamplingNull
+from Entities.RollingEstimation import RollingEstimation
 from data_managemant.FileManager import FileManager
 
 
+class FactorMode(Enum):
+    # STATIC sorts once on the categorizers averaged over the whole sample,
+    # ANNUAL rebalances 2x3 size sorts every year on the previous fiscal year's fundamentals
+    STATIC = "static"
+    ANNUAL = "annual"
+
+
 class FirmSelection:
+    ZSCORE_TESTS: dict[str, str] = {"_ret_zscores": "ret", "capm_zscores": "capm", "f3_zscores": "f3", "f5_zscores": "f5"}
+    CAR_TESTS: dict[str, str] = {"capm_car": "capm", "f3_car": "f3", "f5_car": "f5"}
+    RANK_TESTS: dict[str, str] = {"capm_ranks": "capm", "f3_ranks": "f3", "f5_ranks": "f5"}
 
-    def __init__(self, firms: dict[str, Firm], name: str = None) -> None:
-        self.firms: dict[str, Firm] = copy.deepcopy(firms)
+    def __init__(
+        self,
+        firms: dict[str, Firm],
+        name: str = None,
+        inference: bool = False,
+        factor_mode: FactorMode = FactorMode.STATIC,
+    ) -> None:
+        self.firms: dict[str, Firm] = {ric: firm.selection_view() for ric, firm in firms.items()}
+        self.inference = inference
+        self.factor_mode = factor_mode
         print(f"\t{name} firms                          {' '*(50-len(name))} {len(self.firms):>4.0f}")
         self.firms_with_fundamentals: dict[str, Firm] = {}
         for ric, firm in self.firms.items():
@@ -37,104 +60,137 @@ class FirmSelection:
     def returns(self) -> np.ndarray:
         return np.concatenate([firm.daily_returns for firm in self.firms_with_fundamentals.values()], axis=0)
 
+    def factor_returns(self, factor_mode: FactorMode | None = None) -> tuple[pd.Series, pd.Series, pd.Series, pd.Series]:
+        factor_mode = self.factor_mode if factor_mode is None else factor_mode
+        firms = list(self.firms_with_fundamentals.values())
+        # all returns aligned once, dates x firms, every factor leg is a row mean over its member columns
+        # (the firms' CAPM date axis series, not the raw ReturnPanel columns, see _aligned_panel)
+        panel = pd.concat([firm.daily_returns.rename(firm.ric) for firm in firms], axis=1, join="outer")
+        returns = panel.to_numpy(dtype=np.float64)
+        if factor_mode == FactorMode.ANNUAL:
+            return self._annual_factor_returns(firms, panel.index, returns)
+
+        smb_categorizers = np.array([firm.smb_categorizer for firm in firms], dtype=np.float64)
+        smb_cut = np.quantile(smb_categorizers, 0.5)
+        smb = self._long_short(panel.index, returns, low=smb_categorizers < smb_cut, high=smb_cut <= smb_categorizers)
+
+        hms_categorizers = np.array([firm.hms_categorizer for firm in firms], dtype=np.float64)
+        low_hms_cut, high_hms_cut = np.quantile(hms_categorizers, q=[0.3, 0.7])
+        hms = self._long_short(panel.index, returns, low=hms_categorizers <= low_hms_cut, high=high_hms_cut <= hms_categorizers)
+
+        rmw_categorizers = np.array([firm.rmw_categorizer for firm in firms], dtype=np.float64)
+        low_rmw_cut, high_rmw_cut = np.quantile(rmw_categorizers, q=[0.3, 0.7])
+        rmw = self._long_short(panel.index, returns, low=rmw_categorizers <= low_rmw_cut, high=high_rmw_cut <= rmw_categorizers)
+
+        cma_categorizers = np.array([firm.cma_categorizer for firm in firms], dtype=np.float64)
+        low_cma_cut, high_cma_cut = np.quantile(cma_categorizers, q=[0.3, 0.7])
+        cma = self._long_short(panel.index, returns, low=cma_categorizers <= low_cma_cut, high=high_cma_cut <= cma_categorizers)
+        return smb, hms, rmw, cma
+
+    @staticmethod
+    def _annual_factor_returns(
+        firms: list[Firm],
+        dates: pd.DatetimeIndex,
+        returns: np.ndarray,
+    ) -> tuple[pd.Series, pd.Series, pd.Series, pd.Series]:
+        date_years = dates.year.to_numpy()
+        years = np.unique(date_years)
+        # (years x firms) categorizers known at the start of every year, i.e. from the previous fiscal year end
+        categorizers = {name: np.full((len(years), len(firms)), np.nan) for name in ["smb", "hms", "rmw", "cma"]}
+        for j, firm in enumerate(firms):
+            annual = firm.annual_categorizers
+            rows = np.searchsorted(years, annual.index.to_numpy() + 1)
+            found = rows < len(years)
+            found[found] = years[rows[found]] == annual.index.to_numpy()[found] + 1
+            for name in categorizers:
+                categorizers[name][rows[found], j] = annual[name].to_numpy(dtype=np.float64)[found]
+
+        # (years x firms x portfolios) membership, the 2x3 size x categorizer sorts of HMS, RMW and CMA
+        # in the order small low, small mid, small high, big low, big mid, big high
+        size = categorizers["smb"]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", category=RuntimeWarning)
+            size_cut = np.nanquantile(size, 0.5, axis=1)[:, None]
+            cuts = {name: np.nanquantile(categorizers[name], q=[0.3, 0.7], axis=1) for name in ["hms", "rmw", "cma"]}
+        small, big = size < size_cut, size_cut <= size
+        membership = []
+        for name, (low_cut, high_cut) in cuts.items():
+            values = categorizers[name]
+            low, high = values <= low_cut[:, None], high_cut[:, None] <= values
+            mid = (low_cut[:, None] < values) & (values < high_cut[:, None])
+            membership.extend([small & low, small & mid, small & high, big & low, big & mid, big & high])
+        membership = np.stack(membership, axis=2).astype(np.float64)
+
+        # equal weighted portfolio returns, one (dates x firms) @ (firms x portfolios) product per year
+        valid = ~np.isnan(returns)
+        filled = np.where(valid, returns, 0.0)
+        valid = valid.astype(np.float64)
+        portfolios = np.full((len(dates), membership.shape[2]), np.nan)
+        for i, year in enumerate(years):
+            rows = date_years == year
+            with np.errstate(invalid="ignore", divide="ignore"):
+                portfolios[rows] = (filled[rows] @ membership[i]) / (valid[rows] @ membership[i])
+
+        factors = {}
+        smb_legs = []
+        for k, name in enumerate(["hms", "rmw", "cma"]):
+            small_low, small_mid, small_high, big_low, big_mid, big_high = portfolios[:, 6 * k : 6 * (k + 1)].T
+            # low minus high, like the static legs
+            factors[name] = (small_low + big_low) / 2 - (small_high + big_high) / 2
+            smb_legs.append((small_low + small_mid + small_high) / 3 - (big_low + big_mid + big_high) / 3)
+        factors["smb"] = (smb_legs[0] + smb_legs[1] + smb_legs[2]) / 3
+        return tuple(pd.Series(factors[name], index=dates).dropna() for name in ["smb", "hms", "rmw", "cma"])
+
     def set_factors(self):
-        smb_cut = np.quantile([firm.smb_categorizer for firm in self.firms_with_fundamentals.values()], 0.5)
+        self._zscore_panels: dict[str, tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]] = {}
+        self._car_panels: dict[str, tuple[pd.DatetimeIndex, dict[str, np.ndarray]]] = {}
+        self._rank_panels: dict[str, tuple[pd.DatetimeIndex, dict[str, np.ndarray]]] = {}
+        smb, hms, rmw, cma = self.factor_returns()
+        self.factors: dict[str, pd.Series] = {"SMB": smb, "HMS": hms, "RMW": rmw, "CMA": cma}
 
-        smb_low_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if firm.smb_categorizer < smb_cut],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("smb_low_mean")
-        )
-        smb_high_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if smb_cut <= firm.smb_categorizer],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("smb_high_mean")
-        )
-        smb = (smb_low_mean - smb_high_mean).dropna()
-
-        low_hms_cut, high_hms_cut = np.quantile([firm.hms_categorizer for firm in self.firms_with_fundamentals.values()], q=[0.3, 0.7])
-        hms_low_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if firm.hms_categorizer <= low_hms_cut],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("hms_low_mean")
-        )
-        hms_high_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if high_hms_cut <= firm.hms_categorizer],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("hms_high_mean")
-        )
-        hms = (hms_low_mean - hms_high_mean).dropna()
-
-        low_rmw_cut, high_rmw_cut = np.quantile([firm.rmw_categorizer for firm in self.firms_with_fundamentals.values()], q=[0.3, 0.7])
-        rmw_low_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if firm.rmw_categorizer <= low_rmw_cut],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("low_rmw_cut")
-        )
-        rmw_high_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if high_rmw_cut <= firm.rmw_categorizer],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("high_rmw_cut")
-        )
-        rmw = (rmw_low_mean - rmw_high_mean).dropna()
-
-        low_cma_cut, high_cma_cut = np.quantile([firm.cma_categorizer for firm in self.firms_with_fundamentals.values()], q=[0.3, 0.7])
-        cma_low_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if firm.cma_categorizer <= low_cma_cut],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("low_cma_cut")
-        )
-        cma_high_mean = (
-            pd.concat(
-                [firm.daily_returns.rename(firm.ric) for firm in self.firms_with_fundamentals.values() if high_cma_cut <= firm.cma_categorizer],
-                axis=1,
-                join="outer",
-            )
-            .mean(axis=1)
-            .rename("high_cma_cut")
+        if self.inference:
+            for firm in self.firms.values():
+                firm.set_factors(
+                    smb=smb,
+                    hms=hms,
+                    rmw=rmw,
+                    cma=cma,
+                    inference=True,
+                )
+            return
+
+        # all firms' 3 and 5 factor models in a few batched normal equation solves
+        params3, params5 = FactorRegression.fit(
+            stock_premiums={ric: firm.stock_premiums for ric, firm in self.firms_with_fundamentals.items()},
+            market_premiums={ric: firm.market_premiums for ric, firm in self.firms_with_fundamentals.items()},
+            factors=pd.concat([smb.rename("SMB"), hms.rename("HMS"), rmw.rename("RMW"), cma.rename("CMA")], axis=1, join="inner"),
         )
-        cma = (cma_low_mean - cma_high_mean).dropna()
-
-        for firm in self.firms.values():
-            firm.set_factors(
-                smb=smb,
-                hms=hms,
-                rmw=rmw,
-                cma=cma,
-            )
+        for ric, firm in self.firms_with_fundamentals.items():
+            firm.set_factor_exposures(smb=smb, hms=hms, rmw=rmw, cma=cma, params3=params3.loc[ric], params5=params5.loc[ric])
+
+    @staticmethod
+    def _leg_mean(returns: np.ndarray, members: np.ndarray) -> np.ndarray:
+        # same sums as DataFrame.mean(axis=1) over the members' outer join: without gaps the member columns are added
+        # one after another, with gaps the zero filled row major copy is summed pairwise along each row
+        leg = returns[:, members]
+        valid = ~np.isnan(leg)
+        rows = valid.any(axis=1)
+        leg, valid = leg[rows], valid[rows]
+        mean = np.full(len(returns), np.nan)
+        if valid.all():
+            mean[rows] = np.asfortranarray(leg).sum(axis=1) / np.float64(leg.shape[1])
+        else:
+            mean[rows] = np.ascontiguousarray(np.where(valid, leg, 0.0)).sum(axis=1) / valid.sum(axis=1, dtype=np.float64)
+        return mean
+
+    @staticmethod
+    def _long_short(dates: pd.Index, returns: np.ndarray, low: np.ndarray, high: np.ndarray) -> pd.Series:
+        return pd.Series(FirmSelection._leg_mean(returns, low) - FirmSelection._leg_mean(returns, high), index=dates).dropna()
 
     def plot_return_distribution(self, title: str = None):
-        kde = gaussian_kde(self.returns[~np.isnan(self.returns)], bw_method=1.0)  # Adjust bw_method if needed
-        x = np.linspace(min(self.returns), max(self.returns), 1000)
-        y = kde(x)
+        returns = self.returns[~np.isnan(self.returns)]
+        x = np.linspace(returns.min(), returns.max(), 1000)
+        y = KernelDensity.evaluate(returns, x, bw_method=1.0)  # Adjust bw_method if needed
         # Calculate area under curve (should be 1)
         area = simpson(y, x)
         print("Area under the KDE curve:", area)
@@ -149,49 +205,203 @@ class FirmSelection:
         plt.grid(True, linestyle="--", alpha=0.5)
         plt.show()
 
-    def test_returns_at_dates(self, dates: list[datetime]) -> dict[str, pd.DataFrame]:
-        results = {
-            "_ret_zscores": pd.concat(
-                [firm.ret_zscore(dates=dates).rename(firm.ric) for firm in self.firms_with_fundamentals.values()],
-                axis=1,
-                join="outer",
-            ),
-            "capm_zscores": pd.concat(
-                [firm.capm_zscore(dates=dates).rename(firm.ric) for firm in self.firms_with_fundamentals.values()],
-                axis=1,
-                join="outer",
-            ),
-            "f3_zscores": pd.concat(
-                [firm.f3_zscore(dates=dates).rename(firm.ric) for firm in self.firms_with_fundamentals.values()],
-                axis=1,
-                join="outer",
-            ),
-            "f5_zscores": pd.concat(
-                [firm.f5_zscore(dates=dates).rename(firm.ric) for firm in self.firms_with_fundamentals.values()],
-                axis=1,
-                join="outer",
-            ),
-        }
+    @staticmethod
+    def _aligned_panel(series: list[pd.Series]) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+        # (dates x firms) values on the union of the series' dates, and where each series has an entry; built from the
+        # firms' own series rather than sliced from the country ReturnPanel, as these are on the CAPM date axis, trimmed
+        # and filtered per firm, include model residuals the panel does not hold and may come from several countries
+        indices = [s.index.to_numpy(dtype="datetime64[ns]") for s in series]
+        dates = np.unique(np.concatenate(indices)) if 0 < len(indices) else np.array([], dtype="datetime64[ns]")
+        index_names = {s.index.name for s in series}
+        values = np.full((len(dates), len(series)), np.nan)
+        present = np.zeros((len(dates), len(series)), dtype=bool)
+        for j, (s, index) in enumerate(zip(series, indices)):
+            rows = np.searchsorted(dates, index)
+            values[rows, j] = s.to_numpy(dtype=np.float64)
+            present[rows, j] = True
+        return pd.DatetimeIndex(dates, name=index_names.pop() if len(index_names) == 1 else None), values, present
+
+    def zscore_panel(self, name: str) -> tuple[pd.DatetimeIndex, np.ndarray, np.ndarray]:
+        # (dates x firms) z-scores of one return type, standardized with every firm's own moments, and where each
+        # firm's series has an entry; built once per factor set
+        if name not in self._zscore_panels:
+            firms = list(self.firms_with_fundamentals.values())
+            index, values, present = self._aligned_panel([firm.return_series(name) for firm in firms])
+            moments = np.array([firm.moments(name) for firm in firms], dtype=np.float64).reshape(len(firms), 2)
+            zscores = (values - moments[:, 0]) / moments[:, 1]
+            self._zscore_panels[name] = (index, zscores, present)
+        return self._zscore_panels[name]
+
+    def car_panel(self, name: str) -> tuple[pd.DatetimeIndex, dict[str, np.ndarray]]:
+        # prefix sums over the (dates x firms) abnormal returns of one model, with a leading zero row, so the
+        # (C)AR, day count and log buy and hold returns of any window are two lookups per firm; built once per factor set
+        if name not in self._car_panels:
+            firms = list(self.firms_with_fundamentals.values())
+            index, abnormal, present = self._aligned_panel([firm.return_series(name) for firm in firms])
+            returns = np.full(abnormal.shape, np.nan)
+            for j, firm in enumerate(firms):
+                rows = index.get_indexer(firm.daily_returns.index)
+                found = 0 <= rows
+                returns[rows[found], j] = firm.daily_returns.to_numpy(dtype=np.float64)[found]
+            valid = present & ~np.isnan(abnormal) & ~np.isnan(returns)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                # total and expected (total minus abnormal) returns compounded in logs
+                log_returns = np.where(valid, np.log1p(returns), 0.0)
+                log_expected = np.where(valid, np.log1p(returns - abnormal), 0.0)
+            prefix = {
+                "ar": np.where(valid, abnormal, 0.0),
+                "days": valid.astype(np.int64),
+                "log_returns": log_returns,
+                "log_expected": log_expected,
+            }
+            self._car_panels[name] = (
+                index,
+                {key: np.concatenate([np.zeros((1, len(firms)), dtype=values.dtype), np.cumsum(values, axis=0)]) for key, values in prefix.items()},
+            )
+        return self._car_panels[name]
+
+    def rank_panel(self, name: str) -> tuple[pd.DatetimeIndex, dict[str, np.ndarray]]:
+        # every firm's residuals ranked over its whole series (as uniform ranks K / (T + 1)) and their signs, with the
+        # rank test's standard deviation over all dates and every firm's share of positive residuals; built once per factor set
+        if name not in self._rank_panels:
+            index, residuals, _ = self._aligned_panel([firm.return_series(name) for firm in self.firms_with_fundamentals.values()])
+            valid = ~np.isnan(residuals)
+            counts = valid.sum(axis=0)
+            centered = rankdata(residuals, axis=0, nan_policy="omit") / (counts + 1) - 0.5
+            day_counts = valid.sum(axis=1)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                day_statistics = np.nansum(centered, axis=1) / np.sqrt(day_counts)
+                positive = valid & (0 < residuals)
+                self._rank_panels[name] = (
+                    index,
+                    {
+                        "centered_ranks": centered,
+                        "positive": positive,
+                        "positive_share": positive.sum(axis=0) / counts,
+                        "rank_std": np.array(np.sqrt(np.mean(day_statistics[0 < day_counts] ** 2))),
+                    },
+                )
+        return self._rank_panels[name]
+
+    def test_ranks_at_dates(self, dates: list[datetime]) -> dict[str, pd.DataFrame]:
+        # Corrado (Zivney) rank test and generalized sign test per event date, gathered from the cached rank panels
+        results = {}
+        for result_name, name in FirmSelection.RANK_TESTS.items():
+            index, panel = self.rank_panel(name)
+            rows = index.get_indexer(pd.DatetimeIndex(dates).unique())
+            rows = np.sort(rows[0 <= rows])
+            centered = panel["centered_ranks"][rows]
+            valid = ~np.isnan(centered)
+            num_firms = valid.sum(axis=1)
+            rows, centered, valid, num_firms = rows[0 < num_firms], centered[0 < num_firms], valid[0 < num_firms], num_firms[0 < num_firms]
+            rank_statistic = np.nansum(centered, axis=1) / np.sqrt(num_firms) / panel["rank_std"]
+            positive = (panel["positive"][rows] & valid).sum(axis=1)
+            expected_share = np.where(valid, panel["positive_share"], 0.0).sum(axis=1) / num_firms
+            with np.errstate(invalid="ignore", divide="ignore"):
+                sign_statistic = (positive - num_firms * expected_share) / np.sqrt(num_firms * expected_share * (1 - expected_share))
+            df = pd.DataFrame(
+                {
+                    "Firms_with_return": num_firms,
+                    "rank_statistic": rank_statistic,
+                    "rank_p_value": 2 * norm.sf(np.abs(rank_statistic)),
+                    "positive": positive,
+                    "expected_positive": num_firms * expected_share,
+                    "sign_statistic": sign_statistic,
+                    "sign_p_value": 2 * norm.sf(np.abs(sign_statistic)),
+                },
+                index=index[rows],
+            )
+            df.index.name = result_name
+            results[result_name] = df
+        return results
+
+    def test_returns_at_dates(
+        self,
+        dates: list[datetime],
+        estimation_window: tuple[int, int] | None = None,
+    ) -> dict[str, pd.DataFrame]:
+        # estimation_window (days, gap) in trading days fits every event date's models on the days before it,
+        # otherwise the models fitted on the whole sample are used
+        rics = list(self.firms_with_fundamentals.keys())
+        results = {}
+        for result_name, name in FirmSelection.ZSCORE_TESTS.items():
+            index, zscores, present = self.zscore_panel(name)
+            # one gather of all event dates, keeping the dates at least one firm has an entry for
+            rows = index.get_indexer(pd.DatetimeIndex(dates).unique())
+            rows = np.sort(rows[0 <= rows])
+            rows = rows[present[rows].any(axis=1)]
+            results[result_name] = pd.DataFrame(
+                zscores[rows] if estimation_window is None else self._estimation_window_zscores(name, index[rows], *estimation_window),
+                index=index[rows],
+                columns=rics,
+            )
         return results
 
+    def estimation_inputs(self, name: str) -> tuple[pd.DatetimeIndex, np.ndarray, list[np.ndarray]]:
+        # (dates x firms) regressand and regressor columns of one return type on the trading days of the selection
+        firms = list(self.firms_with_fundamentals.values())
+        index, returns, _ = self._aligned_panel([firm.daily_returns for firm in firms])
+        if name == "ret":
+            return index, returns, []
+
+        def aligned(series: list[pd.Series]) -> np.ndarray:
+            values = np.full(returns.shape, np.nan)
+            for j, s in enumerate(series):
+                positions = index.get_indexer(s.index)
+                values[positions[0 <= positions], j] = s.to_numpy(dtype=np.float64)[0 <= positions]
+            return values
+
+        columns = [aligned([firm.market_premiums for firm in firms])]
+        factors = {"capm": [], "f3": ["SMB", "HMS"], "f5": ["SMB", "HMS", "RMW", "CMA"]}[name]
+        columns += [self.factors[factor].reindex(index).to_numpy(dtype=np.float64) for factor in factors]
+        return index, aligned([firm.stock_premiums for firm in firms]), columns
+
+    def _estimation_window_zscores(self, name: str, dates: pd.DatetimeIndex, estimation_days: int, gap_days: int) -> np.ndarray:
+        index, y, columns = self.estimation_inputs(name)
+        rows = index.get_indexer(dates)
+        found = 0 <= rows
+        zscores = np.full((len(dates), y.shape[1]), np.nan)
+        if found.any():
+            zscores[found] = RollingEstimation.zscores(
+                y=y,
+                columns=columns,
+                event_rows=rows[found],
+                estimation_days=estimation_days,
+                gap_days=gap_days,
+            )
+        return zscores
+
+    @staticmethod
+    def _breaching_firms(breaches: np.ndarray, rics: pd.Index, rows: np.ndarray, limits: np.ndarray) -> np.ndarray:
+        # "[ric | ric | ...]" of the firms breaching each (date row, limit) pair, names sorted
+        order = np.array(sorted(range(len(rics)), key=lambda j: rics[j]), dtype=np.int64)
+        pairs, firms = np.nonzero(breaches[rows[:, None], order[None, :], limits[:, None]])
+        names = rics.to_numpy(dtype=object)[order][firms]
+        same_pair = np.r_[False, pairs[1:] == pairs[:-1]]
+        names[same_pair] = " | " + names[same_pair]
+        # every pair has at least one breaching firm, its real amount exceeds the expected one
+        joined = np.add.reduceat(names, np.flatnonzero(~same_pair)) if 0 < len(names) else names
+        return "[" + joined + "]"
+
     def test_returns_at_dates_summary(
         self,
         dates: list[datetime],
         z_score_limits: list[float] = None,
         print_stats: bool = False,
         excel_name: str = None,
+        estimation_window: tuple[int, int] | None = None,
     ) -> dict[str, pd.DataFrame]:
         if z_score_limits is None:
             z_score_limits = [1.645, 1.96, 2.575, 3.0]
         z_score_limits_perc = {z: (norm.cdf(-z) - norm.cdf(z) + 1.0) for z in z_score_limits}
 
-        test_results = self.test_returns_at_dates(dates=dates)
+        test_results = self.test_returns_at_dates(dates=dates, estimation_window=estimation_window)
         breach_dfs = {}
         comp_dfs = {}
         for return_type, z_scores in test_results.items():
-            # real
-            df_real_breaches = {lim: z_scores.abs().gt(lim) for lim in z_score_limits}
-            df_real = pd.DataFrame({lim: z_scores.abs().gt(lim).sum(axis=1) for lim in z_score_limits})
+            # real, (dates x firms x limits) breaches of every limit in one comparison
+            breaches = np.abs(z_scores.to_numpy(dtype=np.float64))[:, :, None] > np.array(z_score_limits, dtype=np.float64)
+            df_real = pd.DataFrame(breaches.sum(axis=1), index=z_scores.index, columns=z_score_limits)
             # df = df.rename(columns=lambda z: str(z))
             not_nan_count = z_scores.count(axis=1)
             df_real.insert(0, "Firms_with_return", not_nan_count)
@@ -232,9 +442,12 @@ class FirmSelection:
             comp = comp.loc[comp.loc[:, "exp_gt_real"], :]
             if not comp.empty:
                 comp.loc[:, "firms"] = None
-                for i, row in comp.iterrows():
-                    ser = df_real_breaches[i[1]].loc[i[0], :].copy()
-                    comp.at[i, "firms"] = f'[{" | ".join(sorted(ser[ser].index))}]'
+                comp.loc[:, "firms"] = self._breaching_firms(
+                    breaches=breaches,
+                    rics=z_scores.columns,
+                    rows=z_scores.index.get_indexer(comp.index.get_level_values("date")),
+                    limits=pd.Index(z_score_limits).get_indexer(comp.index.get_level_values("z_score")),
+                )
 
             breach_dfs[f"{return_type}_comp"] = comp.copy()
 
@@ -250,14 +463,193 @@ class FirmSelection:
                 print(df_exp)
                 print(comp)
 
+        # nonparametric tests on the model residuals, next to the breach counts of the z-scores; they rank the full sample
+        # residuals, so they are left out when the z-scores come from pre-event estimation windows
+        rank_dfs = {} if estimation_window is not None else self.test_ranks_at_dates(dates=dates)
+        if print_stats:
+            for df in rank_dfs.values():
+                print(df)
+
         master_dfs = [df for df in comp_dfs.values() if not df.empty]
         master_df = pd.DataFrame() if len(master_dfs) <= 0 else pd.concat(master_dfs, axis="rows").sort_index()
-        breach_dfs = {"master_comp": master_df} | breach_dfs
+        breach_dfs = {"master_comp": master_df} | breach_dfs | rank_dfs
 
         if excel_name is not None:
             FileManager.write_excel_results(excel_name=excel_name, dfs=breach_dfs)
         return breach_dfs
 
+    def test_returns_at_dates_resampled(
+        self,
+        dates: list[datetime],
+        z_score_limits: list[float] = None,
+        draws: int = 10_000,
+        seed: int = 0,
+        chunk_size: int = 1_000,
+        n_workers: int = 1,
+        excel_name: str = None,
+    ) -> dict[str, pd.DataFrame]:
+        # breach counts against an empirical null: every draw takes one random non event date per firm from its own
+        # z-scores instead of assuming normal residuals
+        if z_score_limits is None:
+            z_score_limits = [1.645, 1.96, 2.575, 3.0]
+        limits = np.array(z_score_limits, dtype=np.float64)
+        null_dfs = {}
+        for result_name, name in FirmSelection.ZSCORE_TESTS.items():
+            index, zscores, present = self.zscore_panel(name)
+            rows = index.get_indexer(pd.DatetimeIndex(dates).unique())
+            rows = np.sort(rows[0 <= rows])
+            rows = rows[present[rows].any(axis=1)]
+            null = ResamplingNull.test(
+                abs_zscores=np.abs(zscores),
+                event_rows=rows,
+                limits=limits,
+                draws=draws,
+                seed=seed,
+                chunk_size=chunk_size,
+                n_workers=n_workers,
+            )
+            df = pd.DataFrame(
+                {column: values.ravel() for column, values in null.items() if column != "firms_with_return"},
+                index=pd.MultiIndex.from_product([index[rows], z_score_limits], names=["date", "z_score"]),
+            )
+            df.insert(0, "Firms_with_return", np.repeat(null["firms_with_return"], len(limits)))
+            null_dfs[f"{result_name}_null"] = df
+
+        if excel_name is not None:
+            FileManager.write_excel_results(excel_name=excel_name, dfs=null_dfs)
+        return null_dfs
+
+    @staticmethod
+    def event_dates(events: pd.DataFrame) -> pd.DataFrame:
+        # one (event_id, date) row per event day, events are given by a "date" column or by "start_date" / "end_date" windows
+        if "date" in events.columns:
+            event_dates = pd.DataFrame({"event_id": events["event_id"].to_numpy(), "date": pd.to_datetime(events["date"]).to_numpy()})
+        elif "start_date" in events.columns and "end_date" in events.columns:
+            starts = pd.to_datetime(events["start_date"]).to_numpy(dtype="datetime64[D]")
+            ends = pd.to_datetime(events["end_date"]).to_numpy(dtype="datetime64[D]")
+            lengths = (ends - starts).astype(np.int64) + 1
+            reversed_windows = lengths <= 0
+            if reversed_windows.any():
+                # no days to test, test_events keeps these events with days == 0
+                warnings.warn(f"events {list(pd.unique(events['event_id'].to_numpy()[reversed_windows]))} end before they start")
+            lengths = np.maximum(lengths, 0)
+            offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+            event_dates = pd.DataFrame(
+                {
+                    "event_id": np.repeat(events["event_id"].to_numpy(), lengths),
+                    "date": (np.repeat(starts, lengths) + offsets).astype("datetime64[ns]"),
+                }
+            )
+        else:
+            raise ValueError('events need an "event_id" and either a "date" or a "start_date" and "end_date" column')
+        return event_dates.drop_duplicates(ignore_index=True)
+
+    def test_events(self, events: pd.DataFrame, z_score_limits: list[float] = None) -> pd.DataFrame:
+        # breach statistics of many events against the already fitted models, summed over every event's days
+        if z_score_limits is None:
+            z_score_limits = [1.645, 1.96, 2.575, 3.0]
+        limits = np.array(z_score_limits, dtype=np.float64)
+        limits_perc = norm.cdf(-limits) - norm.cdf(limits) + 1.0
+
+        event_dates = self.event_dates(events)
+        # every input event keeps its row group, also the ones without a day to test
+        event_ids = pd.Index(pd.unique(events["event_id"].to_numpy()))
+        codes = event_ids.get_indexer(event_dates["event_id"])
+        dates = pd.DatetimeIndex(event_dates["date"])
+
+        result_names = list(FirmSelection.ZSCORE_TESTS.keys())
+        shape = (len(event_ids), len(result_names), len(limits))
+        days = np.zeros(shape[:2], dtype=np.int64)
+        firms_with_return = np.zeros(shape[:2], dtype=np.int64)
+        real = np.zeros(shape, dtype=np.int64)
+        exp = np.zeros(shape, dtype=np.float64)
+        breach_days = np.zeros(shape, dtype=np.int64)
+        for k, (result_name, name) in enumerate(FirmSelection.ZSCORE_TESTS.items()):
+            index, zscores, present = self.zscore_panel(name)
+            rows = index.get_indexer(dates)
+            found = 0 <= rows
+            # every distinct day is evaluated once, then summed into the events it belongs to
+            unique_rows, inverse = np.unique(rows[found], return_inverse=True)
+            abs_z = np.abs(zscores[unique_rows])
+            day_counts = (~np.isnan(abs_z)).sum(axis=1)
+            day_real = (abs_z[:, :, None] > limits).sum(axis=1)
+            day_exp = np.ceil(day_counts[:, None] * limits_perc)
+            event_codes = codes[found]
+            np.add.at(days[:, k], event_codes, present[unique_rows].any(axis=1)[inverse])
+            np.add.at(firms_with_return[:, k], event_codes, day_counts[inverse])
+            np.add.at(real[:, k], event_codes, day_real[inverse])
+            np.add.at(exp[:, k], event_codes, day_exp[inverse])
+            np.add.at(breach_days[:, k], event_codes, (day_exp < day_real)[inverse])
+
+        index = pd.MultiIndex.from_product([event_ids, result_names, z_score_limits], names=["event_id", "return_type", "z_score"])
+        return pd.DataFrame(
+            {
+                "days": np.repeat(days, len(limits)),
+                "firms_with_return": np.repeat(firms_with_return, len(limits)),
+                "real_amount": real.ravel(),
+                "exp_amount": exp.ravel(),
+                "exp_gt_real": (exp < real).ravel(),
+                "breach_days": breach_days.ravel(),
+            },
+            index=index,
+        )
+
+    def test_event_windows(
+        self,
+        dates: list[datetime],
+        windows: list[tuple[int, int]] = None,
+        excel_name: str = None,
+    ) -> pd.DataFrame:
+        # cumulative (CAR) and buy and hold (BHAR) abnormal returns over trading day windows around every event date,
+        # a window starts on the first trading day at or after the event; firms need a return on every day of the window
+        if windows is None:
+            windows = [(-1, 1), (0, 5)]
+        rows = []
+        for return_type, name in FirmSelection.CAR_TESTS.items():
+            index, prefix = self.car_panel(name)
+            stds = np.array([firm.moments(name)[1] for firm in self.firms_with_fundamentals.values()], dtype=np.float64)
+            events = np.unique(index.searchsorted(pd.DatetimeIndex(dates)))
+            events = events[events < len(index)]
+            for first, last in windows:
+                length = last - first + 1
+                starts, ends = events + first, events + last + 1
+                inside = (0 <= starts) & (ends <= len(index))
+                starts, ends = starts[inside], ends[inside]
+                # (events x firms) window sums, two prefix lookups each
+                window = {key: values[ends] - values[starts] for key, values in prefix.items()}
+                complete = window["days"] == length
+                num_firms = complete.sum(axis=1)
+                car = np.where(complete, window["ar"], np.nan)
+                bhar = np.where(complete, np.expm1(window["log_returns"]) - np.expm1(window["log_expected"]), np.nan)
+                scar = car / (stds * np.sqrt(length))
+                with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+                    warnings.simplefilter("ignore", category=RuntimeWarning)
+                    mean_car, std_car = np.nanmean(car, axis=1), np.nanstd(car, axis=1, ddof=1)
+                    mean_bhar, std_bhar = np.nanmean(bhar, axis=1), np.nanstd(bhar, axis=1, ddof=1)
+                    mean_scar = np.nanmean(scar, axis=1)
+                    rows.append(
+                        pd.DataFrame(
+                            {
+                                "date": index[events[inside]],
+                                "return_type": return_type,
+                                "window": f"[{first:+d},{last:+d}]",
+                                "Firms_with_return": num_firms,
+                                "mean_car": mean_car,
+                                "median_car": np.nanmedian(car, axis=1),
+                                "t_car": mean_car / (std_car / np.sqrt(num_firms)),
+                                "mean_scar": mean_scar,
+                                "z_scar": mean_scar * np.sqrt(num_firms),
+                                "mean_bhar": mean_bhar,
+                                "t_bhar": mean_bhar / (std_bhar / np.sqrt(num_firms)),
+                            }
+                        )
+                    )
+        car_df = pd.concat(rows, axis="rows").set_index(["date", "return_type", "window"]).sort_index()
+
+        if excel_name is not None:
+            FileManager.write_excel_results(excel_name=excel_name, dfs={"event_windows": car_df})
+        return car_df
+
     def test_esg(self, years: list[int] | None, excel_name: None | str = None) -> pd.DataFrame:
         con_esg: pd.DataFrame = pd.concat(
             [firm.df_esg for firm in self.firms_with_esg.values()],
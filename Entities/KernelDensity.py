@@ -0,0 +1,62 @@
+import numpy as np
+from scipy.signal import fftconvolve
+
+
+class KernelDensity:
+    # grid points per bandwidth, the kernel is cut off after CUTOFF bandwidths
+    BINS_PER_BANDWIDTH: int = 32
+    CUTOFF: float = 8.0
+    MAX_BINS: int = 2**22
+
+    @staticmethod
+    def bandwidth(values: np.ndarray, bw_method: str | float | None = None) -> float:
+        # gaussian kernel standard deviation with scipy's gaussian_kde semantics: the factor times the sample std
+        n = len(values)
+        if bw_method is None or bw_method == "scott":
+            factor = n ** (-1 / 5)
+        elif bw_method == "silverman":
+            factor = (n * 3 / 4) ** (-1 / 5)
+        elif np.isscalar(bw_method) and not isinstance(bw_method, str):
+            factor = float(bw_method)
+        else:
+            raise ValueError("bw_method should be 'scott', 'silverman', None or a scalar")
+        return factor * np.std(values, ddof=1)
+
+    @staticmethod
+    def evaluate(values: np.ndarray, x: np.ndarray, bw_method: str | float | None = None) -> np.ndarray:
+        # gaussian kernel density of values at the points x, the values are linearly binned on a grid of
+        # BINS_PER_BANDWIDTH points per bandwidth and convolved with the kernel by FFT, in O(N + grid log grid)
+        values = np.asarray(values, dtype=np.float64)
+        x = np.asarray(x, dtype=np.float64)
+        if len(values) < 2:
+            raise ValueError("at least two values are needed for a kernel density")
+        h = KernelDensity.bandwidth(values, bw_method=bw_method)
+        if not 0 < h < np.inf:
+            raise ValueError("the values need a positive, finite bandwidth")
+
+        # the grid covers the points of x within CUTOFF bandwidths of a value and the values within CUTOFF bandwidths
+        # of x, everything further away adds nothing
+        reach = KernelDensity.CUTOFF * h
+        eval_low, eval_high = max(x.min(), values.min() - reach), min(x.max(), values.max() + reach)
+        if eval_high < eval_low:
+            return np.zeros(x.shape)
+        low = min(eval_low, max(values.min(), x.min() - reach))
+        high = max(eval_high, min(values.max(), x.max() + reach))
+        if high <= low:
+            return np.zeros(x.shape)
+        num_bins = int(min(np.ceil((high - low) / h * KernelDensity.BINS_PER_BANDWIDTH), KernelDensity.MAX_BINS)) + 1
+        delta = (high - low) / (num_bins - 1)
+
+        # linear binning, every value splits its weight between the two neighbouring grid points
+        inside = values[(low <= values) & (values <= high)]
+        position = (inside - low) / delta
+        left = np.minimum(np.floor(position).astype(np.int64), num_bins - 2)
+        share = position - left
+        counts = np.bincount(left, weights=1 - share, minlength=num_bins) + np.bincount(left + 1, weights=share, minlength=num_bins)
+
+        steps = int(min(np.ceil(reach / delta), num_bins - 1))
+        offsets = np.arange(-steps, steps + 1) * delta / h
+        kernel = np.exp(-0.5 * offsets**2) / (np.sqrt(2 * np.pi) * h * len(values))
+        density = np.maximum(fftconvolve(counts, kernel, mode="same"), 0.0)
+        grid = np.linspace(low, high, num_bins)
+        return np.interp(x, grid, density, left=0.0, right=0.0)
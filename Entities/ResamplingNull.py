@@ -0,0 +1,91 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+_worker_null_inputs: dict[str, np.ndarray] | None = None
+
+
+def _init_null_worker(pool: np.ndarray, offsets: np.ndarray, lengths: np.ndarray, presence: np.ndarray, limits: np.ndarray):
+    global _worker_null_inputs
+    _worker_null_inputs = {"pool": pool, "offsets": offsets, "lengths": lengths, "presence": presence, "limits": limits}
+
+
+def _null_histogram_in_worker(draws: int, seed: np.random.SeedSequence) -> np.ndarray:
+    return ResamplingNull.null_histogram(draws=draws, seed=seed, **_worker_null_inputs)
+
+
+class ResamplingNull:
+    @staticmethod
+    def null_histogram(
+        pool: np.ndarray,
+        offsets: np.ndarray,
+        lengths: np.ndarray,
+        presence: np.ndarray,
+        limits: np.ndarray,
+        draws: int,
+        seed: np.random.SeedSequence,
+    ) -> np.ndarray:
+        # every draw picks one pooled |z| per firm, the breaching firms present on an event date give its null count;
+        # returns the (event dates x limits x firms + 1) histogram of these counts
+        rng = np.random.default_rng(seed)
+        num_firms, num_dates = presence.shape
+        picks = offsets + rng.integers(0, np.maximum(lengths, 1), size=(draws, num_firms))
+        values = pool[np.minimum(picks, len(pool) - 1)] if 0 < len(pool) else np.zeros((draws, num_firms))
+        histogram = np.zeros((num_dates, len(limits), num_firms + 1), dtype=np.int64)
+        for k, limit in enumerate(limits):
+            # exact integer counts, the products only add zeros and ones
+            counts = ((values > limit).astype(np.float64) @ presence).astype(np.int64)
+            keys = np.arange(num_dates) * (num_firms + 1) + counts
+            histogram[:, k, :] = np.bincount(keys.ravel(), minlength=num_dates * (num_firms + 1)).reshape(num_dates, num_firms + 1)
+        return histogram
+
+    @staticmethod
+    def test(
+        abs_zscores: np.ndarray,
+        event_rows: np.ndarray,
+        limits: np.ndarray,
+        draws: int = 10_000,
+        seed: int = 0,
+        chunk_size: int = 1_000,
+        n_workers: int = 1,
+    ) -> dict[str, np.ndarray]:
+        # abs_zscores: (dates x firms) |z| with NaN where a firm has no value, every firm's null pool are its non event dates
+        event_dates = np.zeros(len(abs_zscores), dtype=bool)
+        event_dates[event_rows] = True
+        pool_mask = ~np.isnan(abs_zscores) & ~event_dates[:, None]
+        lengths = pool_mask.sum(axis=0)
+        offsets = np.cumsum(lengths) - lengths
+        pool = abs_zscores.T[pool_mask.T]
+
+        event_values = abs_zscores[event_rows]
+        present = ~np.isnan(event_values) & (0 < lengths)[None, :]
+        presence = present.T.astype(np.float64)
+        real = ((event_values[:, :, None] > limits) & present[:, :, None]).sum(axis=1)
+
+        # every chunk of draws has its own child seed, so the result does not depend on chunking over processes
+        chunks = [min(chunk_size, draws - start) for start in range(0, draws, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(chunks))
+        histogram = np.zeros((len(event_rows), len(limits), abs_zscores.shape[1] + 1), dtype=np.int64)
+        if n_workers <= 1 or len(chunks) <= 1:
+            for chunk, chunk_seed in zip(chunks, seeds):
+                histogram += ResamplingNull.null_histogram(pool, offsets, lengths, presence, limits, draws=chunk, seed=chunk_seed)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_null_worker,
+                initargs=(pool, offsets, lengths, presence, limits),
+            ) as executor:
+                for chunk_histogram in executor.map(_null_histogram_in_worker, chunks, seeds):
+                    histogram += chunk_histogram
+
+        counts = np.arange(histogram.shape[2])
+        cumulative = np.cumsum(histogram, axis=2)
+        at_least_real = draws - np.take_along_axis(cumulative, real[:, :, None] - 1, axis=2)[:, :, 0] * (0 < real)
+        return {
+            "firms_with_return": present.sum(axis=1),
+            "real_amount": real,
+            "null_mean": (histogram * counts).sum(axis=2) / draws,
+            "null_q95": (cumulative < 0.95 * draws).sum(axis=2),
+            "null_q99": (cumulative < 0.99 * draws).sum(axis=2),
+            "p_value": (1 + at_least_real) / (1 + draws),
+        }
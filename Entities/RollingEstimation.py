@@ -0,0 +1,103 @@
+import numpy as np
+
+from Entities.FactorRegression import FactorRegression
+
+
+class RollingEstimation:
+    MIN_DAYS_SHARE: float = 0.5
+
+    @staticmethod
+    def _design(columns: list[np.ndarray], row: int, num_firms: int) -> np.ndarray:
+        # (firms x regressors) design of one day, columns are either per firm (dates x firms) or shared (dates,)
+        return np.stack([np.broadcast_to(column[row], (num_firms,)) for column in columns], axis=1)
+
+    @staticmethod
+    def zscores(
+        y: np.ndarray,
+        columns: list[np.ndarray],
+        event_rows: np.ndarray,
+        estimation_days: int,
+        gap_days: int,
+        min_days: int | None = None,
+    ) -> np.ndarray:
+        # (events x firms) z-scores of the event day residuals, every event with an OLS of y on the regressor columns
+        # (a constant is added) fitted on the estimation_days trading days ending gap_days before it; the running cross
+        # products are updated by adding and removing single days while the window slides over the sorted events
+        num_dates, num_firms = y.shape
+        k = len(columns) + 1
+        columns = [np.ones(num_dates)] + columns
+        if min_days is None:
+            min_days = max(k + 1, int(estimation_days * RollingEstimation.MIN_DAYS_SHARE))
+
+        xx = np.zeros((num_firms, k, k))
+        xy = np.zeros((num_firms, k))
+        yy = np.zeros(num_firms)
+        n = np.zeros(num_firms, dtype=np.int64)
+
+        def update(row: int, sign: float):
+            x = RollingEstimation._design(columns, row, num_firms)
+            valid = ~np.isnan(y[row]) & ~np.isnan(x).any(axis=1)
+            x = np.where(valid[:, None], x, 0.0)
+            target = np.where(valid, y[row], 0.0)
+            xx[:] += sign * (x[:, :, None] * x[:, None, :])
+            xy[:] += sign * (x * target[:, None])
+            yy[:] += sign * target * target
+            n[:] += int(sign) * valid
+
+        zscores = np.full((len(event_rows), num_firms), np.nan)
+        low, high = 0, 0
+        order = np.argsort(event_rows, kind="stable")
+        for i in order:
+            event = event_rows[i]
+            start, end = max(event - gap_days - estimation_days, 0), max(event - gap_days, 0)
+            if high <= start:
+                # no overlap with the previous window, start over instead of removing every day
+                xx[:], xy[:], yy[:], n[:] = 0.0, 0.0, 0.0, 0
+                low, high = start, start
+            while high < end:
+                update(high, 1.0)
+                high += 1
+            while low < start:
+                update(low, -1.0)
+                low += 1
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                fit = (min_days <= n) & (np.linalg.cond(xx) < FactorRegression.MAX_CONDITION)
+            if not fit.any():
+                continue
+            params = np.linalg.solve(xx[fit], xy[fit][:, :, None])[:, :, 0]
+            ssr = np.maximum(yy[fit] - (params * xy[fit]).sum(axis=1), 0.0)
+            sigma = np.sqrt(ssr / (n[fit] - 1))
+            x_event = RollingEstimation._design(columns, event, num_firms)[fit]
+            zscores[i, fit] = (y[event, fit] - (x_event * params).sum(axis=1)) / sigma
+        return zscores
+
+    @staticmethod
+    def refit_zscores(
+        y: np.ndarray,
+        columns: list[np.ndarray],
+        event_rows: np.ndarray,
+        estimation_days: int,
+        gap_days: int,
+        min_days: int | None = None,
+    ) -> np.ndarray:
+        # the same z-scores from one least squares fit per event and firm, the reference for zscores
+        num_dates, num_firms = y.shape
+        k = len(columns) + 1
+        columns = [np.ones(num_dates)] + columns
+        if min_days is None:
+            min_days = max(k + 1, int(estimation_days * RollingEstimation.MIN_DAYS_SHARE))
+        design = np.stack([np.broadcast_to(column.reshape(num_dates, -1), (num_dates, num_firms)) for column in columns], axis=2)
+        zscores = np.full((len(event_rows), num_firms), np.nan)
+        for i, event in enumerate(event_rows):
+            start, end = max(event - gap_days - estimation_days, 0), max(event - gap_days, 0)
+            for j in range(num_firms):
+                x, target = design[start:end, j], y[start:end, j]
+                valid = ~np.isnan(target) & ~np.isnan(x).any(axis=1)
+                if valid.sum() < min_days or np.linalg.cond(x[valid].T @ x[valid]) >= FactorRegression.MAX_CONDITION:
+                    continue
+                params, *_ = np.linalg.lstsq(x[valid], target[valid], rcond=None)
+                residuals = target[valid] - x[valid] @ params
+                sigma = np.sqrt((residuals**2).sum() / (valid.sum() - 1))
+                zscores[i, j] = (y[event, j] - design[event, j] @ params) / sigma
+        return zscores
@@ -1,12 +1,55 @@
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 import pandas as pd
 
+from Entities.CAPMEngine import CAPMEngine
 from Entities.Firm import Firm
 from data_managemant.CountryCodes import COUNTRY
+from data_managemant.DownloadPlanner import DownloadPlan, DownloadPlanner
 from data_managemant.FileManager import FileManager
 from data_managemant.FirmLists import FirmLists
 from data_managemant.LSEGDownloader import LSEGDataDownloader
+from data_managemant.ReturnPanel import ReturnPanel
+
+
+_worker_data_loader = None
+
+
+def _init_firm_worker(file_manager_config: dict, extended_firm_lists: dict[str, pd.DataFrame]):
+    global _worker_data_loader
+    FileManager.set_config(file_manager_config)
+    _worker_data_loader = DataLoader(print_stuff=False, offline=True)
+    _worker_data_loader.firm_lists._extended_firm_lists = extended_firm_lists
+
+
+def _create_firm_inputs_in_worker(
+    country_code: COUNTRY,
+    RICs: list[str],
+    interval_daily_returns: tuple[datetime, datetime],
+    interval_esg: tuple[int, int],
+    min_num_days: int | float,
+) -> tuple[int, dict[str, dict], dict[str, set[str]]]:
+    data_loader = _worker_data_loader
+    data_loader.load_return_panel(country_code=country_code, start_date=min(interval_daily_returns), end_date=max(interval_daily_returns))
+    inputs = {}
+    for ric in RICs:
+        firm_inputs = data_loader.create_firm_inputs(
+            country_code=country_code,
+            RIC=ric,
+            interval_daily_returns=interval_daily_returns,
+            interval_esg=interval_esg,
+            min_num_days=min_num_days,
+        )
+        # the parent holds the country's risk free and market returns, only the firm's own data goes back
+        del firm_inputs["risk_free_rate"], firm_inputs["market_returns"]
+        if firm_inputs["df_daily_returns"] is not None:
+            firm_inputs["df_daily_returns"] = firm_inputs["df_daily_returns"][["total_return", "return_cumulative"]]
+        inputs[ric] = firm_inputs
+    missing = data_loader.missing.pop(country_code, {})
+    return os.getpid(), inputs, missing
 
 
 class DataLoader:
@@ -21,18 +64,23 @@ class DataLoader:
         COUNTRY.GREAT_BRITAIN: ".TRIUKX",
     }
 
-    def __init__(self, print_stuff: bool = True):
+    def __init__(self, print_stuff: bool = True, lseg_backend=None, offline: bool = False):
         # check folders
         self.print_stuff = print_stuff
         FileManager.init_folders()
 
-        self.lseg_downloader = LSEGDataDownloader()
+        # offline: serve cached files only and record what would have been downloaded
+        self.offline = offline
+        self.lseg_downloader = None if offline else LSEGDataDownloader(backend=lseg_backend)
         self.firm_lists = FirmLists(self.lseg_downloader)
+        self.download_planner = DownloadPlanner()
         self._no_esg_data_lists: dict[COUNTRY, list[str]] = {}
         self._no_fundamentals_lists: dict[COUNTRY, list[str]] = {}
         self._firms: dict[COUNTRY, dict[str, dict[int, Firm]]] = {}
         self._rf_cache: dict[COUNTRY, dict[int, pd.DataFrame]] = {}
         self._mr_cache: dict[COUNTRY, dict[int, pd.DataFrame]] = {}
+        self._return_panels: dict[COUNTRY, ReturnPanel] = {}
+        self.missing: dict[COUNTRY, dict[str, set[str]]] = {}
 
     @staticmethod
     def delisting_year_from_ric(ric: str) -> None | tuple[str, int]:
@@ -46,6 +94,39 @@ class DataLoader:
             year = 2000 + year
         return ric, year
 
+    def add_missing(self, country_code: COUNTRY, kind: str, RIC: str):
+        self.missing.setdefault(country_code, {}).setdefault(kind, set()).add(RIC)
+
+    def missing_report(self) -> pd.DataFrame:
+        rows = [
+            (country_code.value, kind, ric)
+            for country_code, kinds in self.missing.items()
+            for kind, rics in kinds.items()
+            for ric in sorted(rics)
+        ]
+        return pd.DataFrame(rows, columns=["country", "kind", "RIC"])
+
+    def print_missing_report(self):
+        report = self.missing_report()
+        if len(report) == 0:
+            print("Offline: all requested data was cached")
+            return
+        print(f"Offline: {len(report)} downloads skipped")
+        for (country, kind), rics in report.groupby(["country", "kind"])["RIC"]:
+            print(f"\t{country+":":<4} {kind:<16} {len(rics):>5} RICs: {", ".join(rics.head(10))}{", ..." if 10 < len(rics) else ""}")
+
+    def _download(
+        self,
+        country_code: COUNTRY,
+        kind: str,
+        RIC: str,
+        download: Callable[[], pd.DataFrame | None],
+    ) -> pd.DataFrame | None:
+        if self.offline:
+            self.add_missing(country_code=country_code, kind=kind, RIC=RIC)
+            return None
+        return download()
+
     def get_daily_returns(
         self,
         country_code: COUNTRY,
@@ -54,13 +135,19 @@ class DataLoader:
         end_date: datetime,
         start_return_index: float = 100.0,
     ) -> pd.DataFrame | None:
-        df, min_date, max_date = FileManager.read_daily_stock_returns(country_code=country_code, RIC=RIC, print_stuff=self.print_stuff)
+        min_date, max_date = FileManager.read_daily_stock_returns_coverage(country_code=country_code, RIC=RIC)
+        df = None
         save = False
-        if df is None or min_date is None or max_date is None:
-            df = self.lseg_downloader.get_total_return(
+        if min_date is None or max_date is None:
+            df = self._download(
+                country_code=country_code,
+                kind="daily returns",
                 RIC=RIC,
-                start_date=start_date,
-                end_date=end_date,
+                download=lambda: self.lseg_downloader.get_total_return(
+                    RIC=RIC,
+                    start_date=start_date,
+                    end_date=end_date,
+                ),
             )
             if df is None or len(df) == 0:
                 return None
@@ -68,27 +155,39 @@ class DataLoader:
             max_date = df["date"].max()
             save = True
         if start_date.date() < min_date.date() or max_date.date() < end_date.date():
-            dfs = []
+            df_before = None
+            df_after = None
             if start_date.date() < min_date.date():
-                df_before = self.lseg_downloader.get_total_return(
+                df_before = self._download(
+                    country_code=country_code,
+                    kind="daily returns",
                     RIC=RIC,
-                    start_date=start_date,
-                    end_date=min_date - timedelta(days=1),
+                    download=lambda: self.lseg_downloader.get_total_return(
+                        RIC=RIC,
+                        start_date=start_date,
+                        end_date=min_date - timedelta(days=1),
+                    ),
                 )
-                if df_before is not None:
-                    dfs.append(df_before)
-            dfs.append(df)
             if max_date.date() < end_date.date():
-                df_after = self.lseg_downloader.get_total_return(
+                df_after = self._download(
+                    country_code=country_code,
+                    kind="daily returns",
                     RIC=RIC,
-                    start_date=max_date + timedelta(days=1),
-                    end_date=end_date,
+                    download=lambda: self.lseg_downloader.get_total_return(
+                        RIC=RIC,
+                        start_date=max_date + timedelta(days=1),
+                        end_date=end_date,
+                    ),
                 )
-                if df_after is not None:
-                    dfs.append(df_after)
-            if 1 < len(dfs):
-                df = pd.concat(dfs, axis="index")
-                save = True
+            if df is None:
+                FileManager.extend_daily_stock_returns(country_code=country_code, RIC=RIC, df_before=df_before, df_after=df_after)
+            else:
+                dfs = [d for d in [df_before, df, df_after] if d is not None]
+                if 1 < len(dfs):
+                    df = pd.concat(dfs, axis="index")
+                    save = True
+        if df is None:
+            df, _, _ = FileManager.read_daily_stock_returns(country_code=country_code, RIC=RIC, print_stuff=self.print_stuff)
         df.set_index("date", drop=False, inplace=True)
         if save:
             FileManager.save_daily_stock_returns(country_code=country_code, RIC=RIC, df=df)
@@ -105,6 +204,9 @@ class DataLoader:
         end_date: datetime,
         start_return_index: float = 100.0,
     ) -> pd.DataFrame | None:
+        panel = self._return_panels.get(country_code, None)
+        if panel is not None and panel.covers(RIC, start_date, end_date):
+            return panel.daily_returns(RIC=RIC, start_date=start_date, end_date=end_date, start_return_index=start_return_index)
         return self.get_daily_returns(
             country_code=country_code,
             RIC=RIC,
@@ -113,6 +215,180 @@ class DataLoader:
             start_return_index=start_return_index,
         )
 
+    def get_return_panel(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+        start_date: datetime,
+        end_date: datetime,
+    ) -> ReturnPanel:
+        panel = self._return_panels.get(country_code, None)
+        if panel is not None and all(panel.covers(ric, start_date, end_date) for ric in RICs):
+            return panel
+        panel = FileManager.read_return_panel(country_code=country_code, start_date=start_date, end_date=end_date, print_stuff=self.print_stuff)
+        if panel is None or not all(ric in panel for ric in RICs):
+            self._return_panels.pop(country_code, None)
+            self.prefetch_daily_stock_returns(country_code=country_code, RICs=list(RICs), start_date=start_date, end_date=end_date)
+            frames = {}
+            for ric in dict.fromkeys(list(RICs) + ([] if panel is None else panel.rics)):
+                frames[ric] = self.get_daily_returns(country_code=country_code, RIC=ric, start_date=start_date, end_date=end_date)
+            panel = ReturnPanel.from_frames(start_date=start_date, end_date=end_date, frames=frames)
+            FileManager.save_return_panel(country_code=country_code, panel=panel)
+        self._return_panels[country_code] = panel
+        return panel
+
+    def load_return_panel(
+        self,
+        country_code: COUNTRY,
+        start_date: datetime,
+        end_date: datetime,
+    ) -> ReturnPanel | None:
+        # read-only counterpart of get_return_panel, never builds or saves a panel
+        panel = self._return_panels.get(country_code, None)
+        if panel is not None and panel.start_date == start_date and panel.end_date == end_date:
+            return panel
+        panel = FileManager.read_return_panel(country_code=country_code, start_date=start_date, end_date=end_date, print_stuff=self.print_stuff)
+        if panel is not None:
+            self._return_panels[country_code] = panel
+        return panel
+
+    def get_daily_stock_returns_needs(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+        start_date: datetime,
+        end_date: datetime,
+    ) -> list[tuple[str, datetime, datetime]]:
+        coverage = FileManager.read_daily_stock_returns_manifest(country_code=country_code, RICs=RICs)
+        needs = []
+        for ric, min_date, max_date in zip(coverage["RIC"], coverage["min_date"], coverage["max_date"]):
+            if pd.isna(min_date) or pd.isna(max_date):
+                needs.append((ric, start_date, end_date))
+                continue
+            if start_date.date() < min_date.date():
+                needs.append((ric, start_date, min_date - timedelta(days=1)))
+            if max_date.date() < end_date.date():
+                needs.append((ric, max_date + timedelta(days=1), end_date))
+        return needs
+
+    def save_downloaded_daily_stock_returns(
+        self,
+        country_code: COUNTRY,
+        downloads: dict[tuple[str, datetime, datetime], pd.DataFrame | None],
+    ):
+        segments: dict[str, list[pd.DataFrame]] = {}
+        for (ric, _, _), df in downloads.items():
+            if df is not None and 0 < len(df):
+                segments.setdefault(ric, []).append(df)
+        for ric, dfs in segments.items():
+            min_date, max_date = FileManager.read_daily_stock_returns_coverage(country_code=country_code, RIC=ric)
+            if min_date is None or max_date is None:
+                FileManager.save_daily_stock_returns(country_code=country_code, RIC=ric, df=pd.concat(dfs, axis="index").sort_values("date"))
+                continue
+            df_before = [df for df in dfs if df["date"].max() < min_date]
+            df_after = [df for df in dfs if max_date < df["date"].min()]
+            FileManager.extend_daily_stock_returns(
+                country_code=country_code,
+                RIC=ric,
+                df_before=None if len(df_before) == 0 else pd.concat(df_before, axis="index").sort_values("date"),
+                df_after=None if len(df_after) == 0 else pd.concat(df_after, axis="index").sort_values("date"),
+            )
+
+    def download_daily_stock_returns(
+        self,
+        needs: dict[COUNTRY, list[tuple[str, datetime, datetime]]],
+        dry_run: bool = False,
+    ) -> DownloadPlan:
+        plan = self.download_planner.plan(needs)
+        if self.print_stuff or dry_run:
+            plan.print()
+        if dry_run or len(plan) == 0:
+            return plan
+        if self.offline:
+            for country_code, country_needs in needs.items():
+                for ric, _, _ in country_needs:
+                    self.add_missing(country_code=country_code, kind="daily returns", RIC=ric)
+            return plan
+        for downloads in self.lseg_downloader.iter_total_return_bulk(plan.download_needs(), chunk_size=self.download_planner.chunk_size):
+            for country_code, country_downloads in plan.split_downloads(downloads).items():
+                self.save_downloaded_daily_stock_returns(country_code=country_code, downloads=country_downloads)
+        return plan
+
+    def prefetch_daily_stock_returns(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+        start_date: datetime,
+        end_date: datetime,
+    ):
+        needs = self.get_daily_stock_returns_needs(country_code=country_code, RICs=RICs, start_date=start_date, end_date=end_date)
+        if len(needs) == 0:
+            return
+        if self.print_stuff:
+            print(f"{country_code.value+":":<4} Prefetch {len(needs)} daily stock return windows")
+        self.download_daily_stock_returns(needs={country_code: needs})
+
+    def refresh_daily_stock_returns(
+        self,
+        countries: list[COUNTRY],
+        start_date: datetime,
+        end_date: datetime,
+        use_dead_list: bool = False,
+        dry_run: bool = False,
+    ) -> DownloadPlan:
+        needs: dict[COUNTRY, list[tuple[str, datetime, datetime]]] = {}
+        for country_code in countries:
+            country_firm_rics = self.firm_lists.get_county_firm_rics_without_dead_firms(
+                country=country_code,
+                dead_date=start_date,
+                use_dead_list=use_dead_list,
+            ).to_list()
+            needs[country_code] = self.get_daily_stock_returns_needs(
+                country_code=country_code,
+                RICs=country_firm_rics,
+                start_date=start_date,
+                end_date=end_date,
+            )
+        return self.download_daily_stock_returns(needs=needs, dry_run=dry_run)
+
+    def prefetch_fundamentals(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+    ):
+        no_fundamentals = set(self.get_no_fundamentals_list(country_code=country_code))
+        missing = [ric for ric in RICs if ric not in no_fundamentals and not FileManager.fundamentals_exist(country_code=country_code, RIC=ric)]
+        if len(missing) == 0:
+            return
+        if self.offline:
+            for ric in missing:
+                self.add_missing(country_code=country_code, kind="fundamentals", RIC=ric)
+            return
+        if self.print_stuff:
+            print(f"{country_code.value+":":<4} Prefetch fundamentals of {len(missing)} firms")
+        for downloads in self.lseg_downloader.iter_fundamentals_bulk(missing):
+            for ric, df in downloads.items():
+                self._store_fundamentals(country_code=country_code, RIC=ric, df=df)
+
+    def prefetch_esg_data(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+    ):
+        no_esg_data = set(self.get_no_esg_data_list(country_code=country_code))
+        missing = [ric for ric in RICs if ric not in no_esg_data and not FileManager.esg_data_exists(country_code=country_code, RIC=ric)]
+        if len(missing) == 0:
+            return
+        if self.offline:
+            for ric in missing:
+                self.add_missing(country_code=country_code, kind="esg data", RIC=ric)
+            return
+        if self.print_stuff:
+            print(f"{country_code.value+":":<4} Prefetch ESG data of {len(missing)} firms")
+        for downloads in self.lseg_downloader.iter_full_esg_data_bulk(missing):
+            for ric, df in downloads.items():
+                self._store_esg_data(country_code=country_code, RIC=ric, df=df)
+
     def get_risk_free_rate(
         self,
         country_code: COUNTRY,
@@ -124,13 +400,19 @@ class DataLoader:
         look_up = self._rf_cache.get(country_code, {}).get(attribute_hash, None)
         if look_up is not None:
             return look_up.copy()
-        df, min_date, max_date = FileManager.read_daily_risk_free_returns(country_code=country_code, print_stuff=self.print_stuff)
+        min_date, max_date = FileManager.read_daily_risk_free_returns_coverage(country_code=country_code)
+        df = None
         save = False
-        if df is None or min_date is None or max_date is None:
-            df = self.lseg_downloader.get_over_night_rates(
+        if min_date is None or max_date is None:
+            df = self._download(
+                country_code=country_code,
+                kind="risk free rate",
                 RIC=DataLoader.RF_RATES[country_code],
-                start_date=start_date,
-                end_date=end_date,
+                download=lambda: self.lseg_downloader.get_over_night_rates(
+                    RIC=DataLoader.RF_RATES[country_code],
+                    start_date=start_date,
+                    end_date=end_date,
+                ),
             )
             if df is None or len(df) == 0:
                 return None
@@ -138,27 +420,39 @@ class DataLoader:
             max_date = df["date"].max()
             save = True
         if start_date.date() < min_date.date() or max_date.date() < end_date.date():
-            dfs = []
+            df_before = None
+            df_after = None
             if start_date.date() < min_date.date():
-                df_before = self.lseg_downloader.get_over_night_rates(
+                df_before = self._download(
+                    country_code=country_code,
+                    kind="risk free rate",
                     RIC=DataLoader.RF_RATES[country_code],
-                    start_date=start_date,
-                    end_date=min_date - timedelta(days=1),
+                    download=lambda: self.lseg_downloader.get_over_night_rates(
+                        RIC=DataLoader.RF_RATES[country_code],
+                        start_date=start_date,
+                        end_date=min_date - timedelta(days=1),
+                    ),
                 )
-                if df_before is not None:
-                    dfs.append(df_before)
-            dfs.append(df)
             if max_date.date() < end_date.date():
-                df_after = self.lseg_downloader.get_over_night_rates(
+                df_after = self._download(
+                    country_code=country_code,
+                    kind="risk free rate",
                     RIC=DataLoader.RF_RATES[country_code],
-                    start_date=max_date + timedelta(days=1),
-                    end_date=end_date,
+                    download=lambda: self.lseg_downloader.get_over_night_rates(
+                        RIC=DataLoader.RF_RATES[country_code],
+                        start_date=max_date + timedelta(days=1),
+                        end_date=end_date,
+                    ),
                 )
-                if df_after is not None:
-                    dfs.append(df_after)
-            if 1 < len(dfs):
-                df = pd.concat(dfs, axis="index")
-                save = True
+            if df is None:
+                FileManager.extend_daily_risk_free_returns(country_code=country_code, df_before=df_before, df_after=df_after)
+            else:
+                dfs = [d for d in [df_before, df, df_after] if d is not None]
+                if 1 < len(dfs):
+                    df = pd.concat(dfs, axis="index")
+                    save = True
+        if df is None:
+            df, _, _ = FileManager.read_daily_risk_free_returns(country_code=country_code, print_stuff=self.print_stuff)
         df.set_index("date", drop=False, inplace=True)
         if save:
             FileManager.save_daily_risk_free_returns(country_code=country_code, df=df)
@@ -181,13 +475,19 @@ class DataLoader:
         look_up = self._mr_cache.get(country_code, {}).get(attribute_hash, None)
         if look_up is not None:
             return look_up.copy()
-        df, min_date, max_date = FileManager.read_daily_market_returns(country_code=country_code, print_stuff=self.print_stuff)
+        min_date, max_date = FileManager.read_daily_market_returns_coverage(country_code=country_code)
+        df = None
         save = False
-        if df is None or min_date is None or max_date is None:
-            df = self.lseg_downloader.get_index_rates(
+        if min_date is None or max_date is None:
+            df = self._download(
+                country_code=country_code,
+                kind="market return",
                 RIC=DataLoader.MARKET_RATES[country_code],
-                start_date=start_date,
-                end_date=end_date,
+                download=lambda: self.lseg_downloader.get_index_rates(
+                    RIC=DataLoader.MARKET_RATES[country_code],
+                    start_date=start_date,
+                    end_date=end_date,
+                ),
             )
             if df is None or len(df) == 0:
                 return None
@@ -195,27 +495,39 @@ class DataLoader:
             max_date = df["date"].max()
             save = True
         if start_date.date() < min_date.date() or max_date.date() < end_date.date():
-            dfs = []
+            df_before = None
+            df_after = None
             if start_date.date() < min_date.date():
-                df_before = self.lseg_downloader.get_index_rates(
+                df_before = self._download(
+                    country_code=country_code,
+                    kind="market return",
                     RIC=DataLoader.MARKET_RATES[country_code],
-                    start_date=start_date,
-                    end_date=min_date - timedelta(days=1),
+                    download=lambda: self.lseg_downloader.get_index_rates(
+                        RIC=DataLoader.MARKET_RATES[country_code],
+                        start_date=start_date,
+                        end_date=min_date - timedelta(days=1),
+                    ),
                 )
-                if df_before is not None:
-                    dfs.append(df_before)
-            dfs.append(df)
             if max_date.date() < end_date.date():
-                df_after = self.lseg_downloader.get_index_rates(
+                df_after = self._download(
+                    country_code=country_code,
+                    kind="market return",
                     RIC=DataLoader.MARKET_RATES[country_code],
-                    start_date=max_date + timedelta(days=1),
-                    end_date=end_date,
+                    download=lambda: self.lseg_downloader.get_index_rates(
+                        RIC=DataLoader.MARKET_RATES[country_code],
+                        start_date=max_date + timedelta(days=1),
+                        end_date=end_date,
+                    ),
                 )
-                if df_after is not None:
-                    dfs.append(df_after)
-            if 1 < len(dfs):
-                df = pd.concat(dfs, axis="index")
-                save = True
+            if df is None:
+                FileManager.extend_daily_market_returns(country_code=country_code, df_before=df_before, df_after=df_after)
+            else:
+                dfs = [d for d in [df_before, df, df_after] if d is not None]
+                if 1 < len(dfs):
+                    df = pd.concat(dfs, axis="index")
+                    save = True
+        if df is None:
+            df, _, _ = FileManager.read_daily_market_returns(country_code=country_code, print_stuff=self.print_stuff)
         df.set_index("date", drop=False, inplace=True)
         if save:
             FileManager.save_daily_market_returns(country_code=country_code, df=df)
@@ -242,6 +554,7 @@ class DataLoader:
                 dead_date=start_date,
                 use_dead_list=use_dead_list,
             ).to_list()
+            self.prefetch_daily_stock_returns(country_code=country_code, RICs=country_firm_rics, start_date=start_date, end_date=end_date)
             country_dfs = {}
             for i, ric in enumerate(country_firm_rics):
                 if self.print_stuff:
@@ -278,6 +591,20 @@ class DataLoader:
         self._no_esg_data_lists[country_code].append(no_esg_data_firm)
         FileManager.save_no_esg_data_list(country_code, self._no_esg_data_lists[country_code])
 
+    def _store_esg_data(
+        self,
+        country_code: COUNTRY,
+        RIC: str,
+        df: pd.DataFrame | None,
+    ) -> pd.DataFrame | None:
+        if df is None:
+            return None
+        if len(df) == 0:
+            self.add_to_no_esg_data_list(country_code=country_code, no_esg_data_firm=RIC)
+            return None
+        FileManager.save_esg_data(country_code=country_code, RIC=RIC, df=df)
+        return df
+
     def get_esg_data(
         self,
         country_code: COUNTRY,
@@ -291,13 +618,13 @@ class DataLoader:
             return None
         df = FileManager.read_esg_data(country_code=country_code, RIC=RIC, print_stuff=self.print_stuff)
         if df is None:
-            df = self.lseg_downloader.get_full_esg_data(RIC=RIC)
+            df = self._store_esg_data(
+                country_code=country_code,
+                RIC=RIC,
+                df=self._download(country_code=country_code, kind="esg data", RIC=RIC, download=lambda: self.lseg_downloader.get_full_esg_data(RIC=RIC)),
+            )
             if df is None:
                 return None
-            if len(df) == 0:
-                self.add_to_no_esg_data_list(country_code=country_code, no_esg_data_firm=RIC)
-                return None
-            FileManager.save_esg_data(country_code=country_code, RIC=RIC, df=df)
         start_date, end_date = datetime(year=start_year, month=1, day=1), datetime(year=end_year, month=12, day=31)
         df = df[df["date"].between(start_date, end_date, inclusive="both")]
         year_end_dates = pd.date_range(datetime(min(df["date"]).year, 12, 31), datetime(max(df["date"]).year, 12, 31), freq="YE")
@@ -318,6 +645,7 @@ class DataLoader:
                 dead_date=datetime(year=start_year, month=1, day=1),
                 use_dead_list=use_dead_list,
             ).to_list()
+            self.prefetch_esg_data(country_code=country_code, RICs=country_firm_rics)
             country_dfs = {}
             for i, ric in enumerate(country_firm_rics):
                 if self.print_stuff:
@@ -353,6 +681,20 @@ class DataLoader:
         self._no_fundamentals_lists[country_code].append(no_fundamentals_firm)
         FileManager.save_no_fundamentals_list(country_code, self._no_fundamentals_lists[country_code])
 
+    def _store_fundamentals(
+        self,
+        country_code: COUNTRY,
+        RIC: str,
+        df: pd.DataFrame | None,
+    ) -> pd.DataFrame | None:
+        if df is None:
+            return None
+        if len(df) == 0:
+            self.add_to_no_fundamentals_list(country_code=country_code, no_fundamentals_firm=RIC)
+            return None
+        FileManager.save_fundamentals(country_code=country_code, RIC=RIC, df=df)
+        return df
+
     def get_fundamentals(
         self,
         country_code: COUNTRY,
@@ -366,13 +708,13 @@ class DataLoader:
             return None
         df = FileManager.read_fundamentals(country_code=country_code, RIC=RIC, print_stuff=self.print_stuff)
         if df is None:
-            df = self.lseg_downloader.get_fundamentals(RIC=RIC)
+            df = self._store_fundamentals(
+                country_code=country_code,
+                RIC=RIC,
+                df=self._download(country_code=country_code, kind="fundamentals", RIC=RIC, download=lambda: self.lseg_downloader.get_fundamentals(RIC=RIC)),
+            )
             if df is None:
                 return None
-            if len(df) == 0:
-                self.add_to_no_fundamentals_list(country_code=country_code, no_fundamentals_firm=RIC)
-                return None
-            FileManager.save_fundamentals(country_code=country_code, RIC=RIC, df=df)
         start_date, end_date = datetime(year=start_year, month=1, day=1), datetime(year=end_year, month=12, day=31)
         df = df[df["date"].between(start_date, end_date, inclusive="both")]
         return df
@@ -391,6 +733,7 @@ class DataLoader:
                 dead_date=datetime(year=start_year, month=1, day=1),
                 use_dead_list=use_dead_list,
             ).to_list()
+            self.prefetch_fundamentals(country_code=country_code, RICs=country_firm_rics)
             country_dfs = {}
             for i, ric in enumerate(country_firm_rics):
                 if self.print_stuff:
@@ -409,17 +752,17 @@ class DataLoader:
             countries_dfs[country_code] = country_dfs
         return countries_dfs
 
-    def create_firm(
+    def create_firm_inputs(
         self,
         country_code: COUNTRY,
         RIC: str,
         interval_daily_returns: tuple[datetime, datetime],
         interval_esg: tuple[int, int],
         min_num_days: int | float = None,
-    ) -> Firm:
+    ) -> dict:
         if min_num_days is not None and min_num_days < 0:
             raise AttributeError("min_num_dates cannot be negative")
-        meta = self.firm_lists.extended_firm_lists[country_code.value].set_index("RIC", drop=False).loc[RIC, :]
+        meta = self.firm_lists.get_firm_meta(country=country_code, RIC=RIC)
         fundamentals: None | pd.DataFrame = self.get_fundamentals(
             country_code=country_code,
             RIC=RIC,
@@ -438,16 +781,7 @@ class DataLoader:
             start_year=min(interval_esg),
             end_year=max(interval_esg),
         )
-        risk_free_rate = self.get_risk_free_rate(
-            country_code=country_code,
-            start_date=min(interval_daily_returns),
-            end_date=max(interval_daily_returns),
-        )["total_return"]
-        market_return = self.get_market_return(
-            country_code=country_code,
-            start_date=min(interval_daily_returns),
-            end_date=max(interval_daily_returns),
-        )["total_return"]
+        risk_free_rate, market_return = self._country_returns(country_code=country_code, interval_daily_returns=interval_daily_returns)
 
         if fundamentals is not None:
             fundamentals = fundamentals.dropna(axis="rows", how="any")
@@ -483,14 +817,55 @@ class DataLoader:
         if self.print_stuff:
             print()
 
-        return Firm(
-            meta=meta,
-            fundamentals=fundamentals,
-            df_daily_returns=daily_returns,
-            df_esg=esg_data,
+        return {
+            "meta": meta,
+            "fundamentals": fundamentals,
+            "df_daily_returns": daily_returns,
+            "df_esg": esg_data,
+            "risk_free_rate": risk_free_rate,
+            "market_returns": market_return,
+        }
+
+    def create_firm(
+        self,
+        country_code: COUNTRY,
+        RIC: str,
+        interval_daily_returns: tuple[datetime, datetime],
+        interval_esg: tuple[int, int],
+        min_num_days: int | float = None,
+    ) -> Firm:
+        inputs = self.create_firm_inputs(
+            country_code=country_code,
+            RIC=RIC,
+            interval_daily_returns=interval_daily_returns,
+            interval_esg=interval_esg,
+            min_num_days=min_num_days,
+        )
+        DataLoader._check_country_returns(country_code=country_code, risk_free_rate=inputs["risk_free_rate"], market_returns=inputs["market_returns"])
+        return Firm(**inputs)
+
+    @staticmethod
+    def create_firms(
+        inputs: dict[str, dict],
+        risk_free_rate: pd.Series,
+        market_returns: pd.Series,
+    ) -> dict[str, Firm]:
+        capm_engine = CAPMEngine(
             risk_free_rate=risk_free_rate,
-            market_returns=market_return,
+            market_returns=market_returns,
+            total_returns={
+                ric: firm_inputs["df_daily_returns"]["total_return"]
+                for ric, firm_inputs in inputs.items()
+                if firm_inputs["df_daily_returns"] is not None
+            },
         )
+        return {
+            ric: Firm(
+                **(firm_inputs | {"risk_free_rate": risk_free_rate, "market_returns": market_returns}),
+                capm_engine=capm_engine,
+            )
+            for ric, firm_inputs in inputs.items()
+        }
 
     def get_firm(
         self,
@@ -516,3 +891,140 @@ class DataLoader:
                 self._firms[country_code][RIC] = {}
             self._firms[country_code][RIC][attribute_hash] = firm
         return firm
+
+    def _country_returns(
+        self,
+        country_code: COUNTRY,
+        interval_daily_returns: tuple[datetime, datetime],
+    ) -> tuple[pd.Series | None, pd.Series | None]:
+        # None where the return is neither cached nor downloadable, e.g. offline, the RIC is then in missing
+        risk_free_rate = self.get_risk_free_rate(
+            country_code=country_code,
+            start_date=min(interval_daily_returns),
+            end_date=max(interval_daily_returns),
+        )
+        market_returns = self.get_market_return(
+            country_code=country_code,
+            start_date=min(interval_daily_returns),
+            end_date=max(interval_daily_returns),
+        )
+        return (
+            None if risk_free_rate is None else risk_free_rate["total_return"],
+            None if market_returns is None else market_returns["total_return"],
+        )
+
+    @staticmethod
+    def _check_country_returns(country_code: COUNTRY, risk_free_rate: pd.Series | None, market_returns: pd.Series | None):
+        if risk_free_rate is None:
+            raise ValueError(f"{country_code.value}: no risk free rate {DataLoader.RF_RATES[country_code]} for the firms")
+        if market_returns is None:
+            raise ValueError(f"{country_code.value}: no market return {DataLoader.MARKET_RATES[country_code]} for the firms")
+
+    def has_country_returns(self, country_code: COUNTRY, interval_daily_returns: tuple[datetime, datetime]) -> bool:
+        risk_free_rate, market_returns = self._country_returns(country_code=country_code, interval_daily_returns=interval_daily_returns)
+        return risk_free_rate is not None and market_returns is not None
+
+    def _cache_firms(
+        self,
+        country_code: COUNTRY,
+        attribute_hash: int,
+        inputs: dict[str, dict],
+        interval_daily_returns: tuple[datetime, datetime],
+    ) -> dict[str, Firm]:
+        if len(inputs) == 0:
+            return {}
+        risk_free_rate, market_returns = self._country_returns(country_code=country_code, interval_daily_returns=interval_daily_returns)
+        DataLoader._check_country_returns(country_code=country_code, risk_free_rate=risk_free_rate, market_returns=market_returns)
+        firms = DataLoader.create_firms(inputs=inputs, risk_free_rate=risk_free_rate, market_returns=market_returns)
+        for ric, firm in firms.items():
+            self._firms.setdefault(country_code, {}).setdefault(ric, {})[attribute_hash] = firm
+        return firms
+
+    def get_firms(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+        interval_daily_returns: tuple[datetime, datetime],
+        interval_esg: tuple[int, int],
+        min_num_days: int | float = None,
+        print_stuff: bool = True,
+    ) -> dict[str, Firm]:
+        attribute_hash = hash((interval_daily_returns, interval_esg, min_num_days))
+        cached = {ric: self._firms.get(country_code, {}).get(ric, {}).get(attribute_hash, None) for ric in RICs}
+        inputs = {}
+        for i, ric in enumerate(RICs):
+            if print_stuff:
+                print(f"{country_code.value+":":<4} {ric:<20} Load {i+1:<4.0f}/{len(RICs):<4.0f} [{(i+1)/len(RICs)*100:>6.2f}%]")
+            if cached[ric] is None:
+                inputs[ric] = self.create_firm_inputs(
+                    country_code=country_code,
+                    RIC=ric,
+                    interval_daily_returns=interval_daily_returns,
+                    interval_esg=interval_esg,
+                    min_num_days=min_num_days,
+                )
+        created = self._cache_firms(country_code=country_code, attribute_hash=attribute_hash, inputs=inputs, interval_daily_returns=interval_daily_returns)
+        return {ric: created[ric] if cached[ric] is None else cached[ric] for ric in RICs}
+
+    def get_firms_parallel(
+        self,
+        country_code: COUNTRY,
+        RICs: list[str],
+        interval_daily_returns: tuple[datetime, datetime],
+        interval_esg: tuple[int, int],
+        min_num_days: int | float = None,
+        n_workers: int = 2,
+        print_stuff: bool = True,
+    ) -> dict[str, Firm]:
+        attribute_hash = hash((interval_daily_returns, interval_esg, min_num_days))
+        cached = {ric: self._firms.get(country_code, {}).get(ric, {}).get(attribute_hash, None) for ric in RICs}
+        to_create = [ric for ric, firm in cached.items() if firm is None]
+        inputs: dict[str, dict] = {}
+        if 0 < len(to_create):
+            # workers only read the local cache, so everything they need has to be on disk before they start
+            self._country_returns(country_code=country_code, interval_daily_returns=interval_daily_returns)
+            FileManager.flush_manifests()
+            num_chunks = min(len(to_create), 4 * n_workers)
+            chunks = [to_create[i::num_chunks] for i in range(num_chunks)]
+            worker_counts: dict[int, int] = {}
+            missing: dict[str, set[str]] = {}
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_firm_worker,
+                initargs=(FileManager.get_config(), self.firm_lists.extended_firm_lists),
+            ) as executor:
+                futures = [
+                    executor.submit(_create_firm_inputs_in_worker, country_code, chunk, interval_daily_returns, interval_esg, min_num_days)
+                    for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    pid, chunk_inputs, chunk_missing = future.result()
+                    inputs |= chunk_inputs
+                    worker_counts[pid] = worker_counts.get(pid, 0) + len(chunk_inputs)
+                    for kind, rics in chunk_missing.items():
+                        missing.setdefault(kind, set()).update(rics)
+                    if print_stuff:
+                        print(
+                            f"{country_code.value+":":<4} Load {len(inputs):>4}/{len(to_create):<4} [{len(inputs)/len(to_create)*100:>6.2f}%]"
+                            f" | worker {pid}: {worker_counts[pid]:>4} firms"
+                        )
+            if print_stuff:
+                print(f"{country_code.value+":":<4} Firms per worker: {", ".join(f"{pid}: {count}" for pid, count in sorted(worker_counts.items()))}")
+
+            if self.offline:
+                for kind, rics in missing.items():
+                    for ric in rics:
+                        self.add_missing(country_code=country_code, kind=kind, RIC=ric)
+            else:
+                # anything a worker could not serve from the cache is loaded here, where downloads are allowed
+                for ric in sorted({ric for rics in missing.values() for ric in rics if ric in inputs}):
+                    inputs[ric] = self.create_firm_inputs(
+                        country_code=country_code,
+                        RIC=ric,
+                        interval_daily_returns=interval_daily_returns,
+                        interval_esg=interval_esg,
+                        min_num_days=min_num_days,
+                    )
+        inputs = {ric: inputs[ric] for ric in to_create}
+        created = self._cache_firms(country_code=country_code, attribute_hash=attribute_hash, inputs=inputs, interval_daily_returns=interval_daily_returns)
+        return {ric: created[ric] if cached[ric] is None else cached[ric] for ric in RICs}
@@ -0,0 +1,156 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from data_managemant.CountryCodes import COUNTRY
+
+
+class DownloadRequest:
+    def __init__(
+        self,
+        RICs: list[str],
+        start_date: datetime,
+        end_date: datetime,
+        needs: list[tuple[COUNTRY, str, datetime, datetime]],
+    ):
+        self.RICs = RICs
+        self.start_date = start_date
+        self.end_date = end_date
+        self.needs = needs
+
+    @property
+    def ric_days(self) -> int:
+        return len(self.RICs) * DownloadPlanner.business_days(self.start_date, self.end_date)
+
+    @property
+    def needed_ric_days(self) -> int:
+        return sum(DownloadPlanner.business_days(start_date, end_date) for _, _, start_date, end_date in self.needs)
+
+
+class DownloadPlan:
+    def __init__(self, requests: list[DownloadRequest]):
+        self.requests = requests
+
+    def __len__(self) -> int:
+        return len(self.requests)
+
+    @property
+    def num_needs(self) -> int:
+        return sum(len(request.needs) for request in self.requests)
+
+    @property
+    def ric_days(self) -> int:
+        return sum(request.ric_days for request in self.requests)
+
+    @property
+    def needed_ric_days(self) -> int:
+        return sum(request.needed_ric_days for request in self.requests)
+
+    def download_needs(self) -> list[tuple[str, datetime, datetime]]:
+        return [(ric, request.start_date, request.end_date) for request in self.requests for ric in request.RICs]
+
+    def split_downloads(
+        self,
+        downloads: dict[tuple[str, datetime, datetime], pd.DataFrame | None],
+    ) -> dict[COUNTRY, dict[tuple[str, datetime, datetime], pd.DataFrame | None]]:
+        # cut every downloaded (RIC, request window) back to the missing windows it was planned for
+        requests = {(ric, request.start_date, request.end_date): request for request in self.requests for ric in request.RICs}
+        country_downloads: dict[COUNTRY, dict[tuple[str, datetime, datetime], pd.DataFrame | None]] = {}
+        for (ric, request_start, request_end), df in downloads.items():
+            request = requests[(ric, request_start, request_end)]
+            for country_code, need_ric, start_date, end_date in request.needs:
+                if need_ric != ric:
+                    continue
+                need_df = df
+                if df is not None and (start_date != request_start or end_date != request_end):
+                    need_df = df[df["date"].between(start_date, end_date, inclusive="both")]
+                country_downloads.setdefault(country_code, {})[(ric, start_date, end_date)] = need_df
+        return country_downloads
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame(
+            [
+                (request.start_date, request.end_date, len(request.RICs), len(request.needs), request.ric_days, request.needed_ric_days)
+                for request in self.requests
+            ],
+            columns=["start_date", "end_date", "RICs", "needs", "ric_days", "needed_ric_days"],
+        )
+
+    def print(self, show_requests: bool = False):
+        overfetch = 0 if self.needed_ric_days == 0 else self.ric_days / self.needed_ric_days - 1
+        print(f"Download plan: {len(self):>5} requests for {self.num_needs:>6} missing windows")
+        print(f"\tRIC-days to fetch: {self.ric_days:>10} (needed {self.needed_ric_days:>10}, overfetch {overfetch:.2%})")
+        if show_requests:
+            for request in self.requests:
+                print(
+                    f"\t{request.start_date:%Y-%m-%d} - {request.end_date:%Y-%m-%d}: {len(request.RICs):>4} RICs {request.ric_days:>8} RIC-days"
+                )
+
+
+class DownloadPlanner:
+    def __init__(
+        self,
+        chunk_size: int = 50,
+        max_overfetch: float = 0.25,
+        request_cost: int = 250,
+    ):
+        # windows are merged while the extra RIC-days stay below max_overfetch of the needed ones
+        # plus request_cost, the RIC-days one saved request is worth
+        self.chunk_size = chunk_size
+        self.max_overfetch = max_overfetch
+        self.request_cost = request_cost
+
+    @staticmethod
+    def business_days(start_date: datetime, end_date: datetime) -> int:
+        return max(1, int(np.busday_count(start_date.date(), (end_date + timedelta(days=1)).date())))
+
+    def _mergeable(self, ric_days: int, needed_ric_days: int) -> bool:
+        return ric_days - needed_ric_days <= self.max_overfetch * needed_ric_days + self.request_cost
+
+    def plan(self, needs: dict[COUNTRY, list[tuple[str, datetime, datetime]]]) -> DownloadPlan:
+        windows: dict[tuple[datetime, datetime], list[tuple[COUNTRY, str, datetime, datetime]]] = {}
+        for country_code, country_needs in needs.items():
+            for ric, start_date, end_date in country_needs:
+                windows.setdefault((start_date, end_date), []).append((country_code, ric, start_date, end_date))
+
+        # greedy sweep over the windows sorted by start, growing a group while its union window stays cheap
+        groups: list[tuple[datetime, datetime, list[tuple[COUNTRY, str, datetime, datetime]]]] = []
+        group_start, group_end, group_needs, group_rics, group_needed = None, None, [], set(), 0
+        for (start_date, end_date), window_needs in sorted(windows.items()):
+            window_rics = {ric for _, ric, _, _ in window_needs}
+            window_needed = len(window_needs) * DownloadPlanner.business_days(start_date, end_date)
+            if group_start is not None:
+                union_start, union_end = min(group_start, start_date), max(group_end, end_date)
+                num_rics = len(group_rics | window_rics)
+                if self._mergeable(num_rics * DownloadPlanner.business_days(union_start, union_end), group_needed + window_needed):
+                    group_start, group_end = union_start, union_end
+                    group_needs = group_needs + window_needs
+                    group_rics |= window_rics
+                    group_needed += window_needed
+                    continue
+                groups.append((group_start, group_end, group_needs))
+            group_start, group_end, group_needs, group_rics, group_needed = start_date, end_date, window_needs, window_rics, window_needed
+        if group_start is not None:
+            groups.append((group_start, group_end, group_needs))
+
+        merged: dict[tuple[datetime, datetime], list[tuple[COUNTRY, str, datetime, datetime]]] = {}
+        for start_date, end_date, group_needs in groups:
+            merged.setdefault((start_date, end_date), []).extend(group_needs)
+
+        requests = []
+        for (start_date, end_date), group_needs in merged.items():
+            rics = list(dict.fromkeys(ric for _, ric, _, _ in group_needs))
+            for i in range(math.ceil(len(rics) / self.chunk_size)):
+                chunk = rics[i * self.chunk_size : (i + 1) * self.chunk_size]
+                chunk_rics = set(chunk)
+                requests.append(
+                    DownloadRequest(
+                        RICs=chunk,
+                        start_date=start_date,
+                        end_date=end_date,
+                        needs=[need for need in group_needs if need[1] in chunk_rics],
+                    )
+                )
+        return DownloadPlan(requests=requests)
@@ -0,0 +1,125 @@
+import random
+import threading
+import time
+from collections.abc import Callable, Hashable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float, min_rate: float = 0.1):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if 1 <= self.tokens:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def slow_down(self, factor: float = 0.5):
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate * factor)
+            self.tokens = min(self.tokens, 0.0)
+
+    def speed_up(self, step: float = 0.1):
+        with self.lock:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + step * self.max_rate)
+
+
+class DownloadScheduler:
+    THROTTLE_MARKERS: tuple[str, ...] = ("429", "too many requests", "throttl", "rate limit", "quota")
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        rate: float = 5.0,
+        burst: float = 5.0,
+        max_tries: int = 5,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        seed: int | None = None,
+        print_stuff: bool = True,
+    ):
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate=rate, capacity=burst)
+        self.max_tries = max_tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.print_stuff = print_stuff
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self.num_calls = 0
+        self.num_retries = 0
+        self.num_throttled = 0
+
+    @staticmethod
+    def is_throttling_error(error: Exception) -> bool:
+        message = f"{type(error).__name__} {error}".lower()
+        return any(marker in message for marker in DownloadScheduler.THROTTLE_MARKERS)
+
+    def backoff_delay(self, attempt: int, throttled: bool) -> float:
+        # full jitter: uniform in [0, cap], with the cap doubling per attempt and once more when throttled
+        cap = min(self.max_delay, self.base_delay * 2 ** (attempt + (1 if throttled else 0)))
+        with self._lock:
+            return self._random.uniform(0, cap)
+
+    def run(self, func: Callable[[], Any], description: str = "") -> Any:
+        for attempt in range(self.max_tries):
+            self.bucket.acquire()
+            with self._lock:
+                self.num_calls += 1
+            try:
+                result = func()
+                self.bucket.speed_up()
+                return result
+            except Exception as e:
+                if self.max_tries <= attempt + 1:
+                    raise e
+                throttled = DownloadScheduler.is_throttling_error(e)
+                if throttled:
+                    self.bucket.slow_down()
+                with self._lock:
+                    self.num_retries += 1
+                    self.num_throttled += throttled
+                delay = self.backoff_delay(attempt, throttled)
+                if self.print_stuff:
+                    print(f"     {description:<20} {'Throttled' if throttled else 'Error'} - try {attempt + 1}/{self.max_tries}, retry in {delay:.2f}s")
+                time.sleep(delay)
+        return None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="download")
+        return self._executor
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        return self.executor.submit(func, *args, **kwargs)
+
+    def as_completed(self, tasks: dict[Hashable, tuple[Callable, tuple, dict]]) -> Iterator[tuple[Hashable, Any]]:
+        futures = {self.submit(func, *args, **kwargs): key for key, (func, args, kwargs) in tasks.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
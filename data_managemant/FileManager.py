@@ -1,10 +1,22 @@
+import atexit
+import json
 import os
+import sys
 from datetime import datetime
+from enum import Enum
 
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
 from data_managemant.CountryCodes import COUNTRY
+from data_managemant.ReturnPanel import ReturnPanel
+
+
+class StorageFormat(Enum):
+    CSV = "csv"
+    PARQUET = "parquet"
+    FEATHER = "feather"
 
 
 class FileManager:
@@ -14,9 +26,34 @@ class FileManager:
     FOLDER_DAILY_MARKET_RETURNS: str = os.path.join(FOLDER_DATA, "daily_market_returns")
     FOLDER_ESG_DATA: str = os.path.join(FOLDER_DATA, "esg_data")
     FOLDER_FUNDAMENTALS: str = os.path.join(FOLDER_DATA, "fundamentals")
+    FOLDER_RETURN_PANELS: str = os.path.join(FOLDER_DATA, "return_panels")
+    FOLDER_LSEG_RECORDINGS: str = os.path.join(FOLDER_DATA, "lseg_recordings")
     OUTPUT_RESULT_FOLDER: str = os.path.join(FOLDER_DATA, "results")
     PATH_RAW_FIRM_LISTS: str = os.path.join(FOLDER_DATA, "Firm_lists.xlsx")
     PATH_EXTENDED_FIRM_LISTS: str = os.path.join(FOLDER_DATA, "Extended_Firm_lists.xlsx")
+    RETURN_STORAGE: StorageFormat = StorageFormat.CSV
+    DAILY_RETURN_COLUMNS: list[str] = ["date", "total_return", "return_index"]
+    DAILY_RETURN_READ_COLUMNS: list[str] = ["date", "total_return"]
+    MANIFEST_FILE_NAME: str = "_manifest.json"
+    MANIFEST_FLUSH_EVERY: int = 100
+    _manifests: dict[str, dict[str, dict]] = {}
+    _dirty_manifests: dict[str, int] = {}
+
+    @staticmethod
+    def set_return_storage(storage: StorageFormat):
+        FileManager.RETURN_STORAGE = storage
+
+    @staticmethod
+    def get_config() -> dict:
+        # locations and storage format, handed to worker processes that do not inherit the parent's class state
+        config = {key: value for key, value in vars(FileManager).items() if key.startswith(("FOLDER_", "PATH_", "OUTPUT_"))}
+        config["RETURN_STORAGE"] = FileManager.RETURN_STORAGE
+        return config
+
+    @staticmethod
+    def set_config(config: dict):
+        for key, value in config.items():
+            setattr(FileManager, key, value)
 
     @staticmethod
     def init_folders():
@@ -61,20 +98,144 @@ class FileManager:
         print("Save done")
 
     @staticmethod
-    def _read_daily_returns(file_path: str, print_stuff: bool = True) -> tuple[pd.DataFrame | None, datetime | None, datetime | None]:
-        if not os.path.exists(file_path):
-            print()
-            return None, None, None
+    def _daily_returns_path(folder_path: str, name: str, storage: StorageFormat = None) -> str:
+        storage = FileManager.RETURN_STORAGE if storage is None else storage
+        return os.path.join(folder_path, f"{name}.{storage.value}")
+
+    @staticmethod
+    def _read_return_file(file_path: str, storage: StorageFormat, columns: list[str]) -> pd.DataFrame:
+        if storage is StorageFormat.PARQUET:
+            return pd.read_parquet(file_path, columns=columns)
+        if storage is StorageFormat.FEATHER:
+            return pd.read_feather(file_path, columns=columns)
         df = pd.read_csv(
             file_path,
             sep=";",
             decimal=",",
             index_col=None,
+            usecols=columns,
             parse_dates=["date"],
+            float_precision="round_trip",
+        )
+        for col in columns:
+            if col != "date":
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+        return df
+
+    @staticmethod
+    def _write_return_file(file_path: str, storage: StorageFormat, df: pd.DataFrame):
+        df = df.loc[:, FileManager.DAILY_RETURN_COLUMNS]
+        if storage is StorageFormat.PARQUET:
+            df.to_parquet(file_path, index=False, compression="zstd")
+        elif storage is StorageFormat.FEATHER:
+            df.reset_index(drop=True).to_feather(file_path, compression="zstd")
+        else:
+            df.to_csv(file_path, sep=";", decimal=",", index=False, header=True)
+
+    @staticmethod
+    def _resolve_daily_returns_path(folder_path: str, name: str) -> tuple[str, StorageFormat]:
+        storage = FileManager.RETURN_STORAGE
+        file_path = FileManager._daily_returns_path(folder_path, name, storage)
+        if not os.path.exists(file_path) and storage is not StorageFormat.CSV:
+            storage = StorageFormat.CSV
+            file_path = FileManager._daily_returns_path(folder_path, name, storage)
+        return file_path, storage
+
+    @staticmethod
+    def _fingerprint(file_path: str) -> str:
+        stat = os.stat(file_path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    @staticmethod
+    def read_manifest(folder_path: str) -> dict[str, dict]:
+        manifest = FileManager._manifests.get(folder_path, None)
+        if manifest is None:
+            manifest_path = os.path.join(folder_path, FileManager.MANIFEST_FILE_NAME)
+            manifest = {}
+            if os.path.exists(manifest_path):
+                with open(manifest_path, "r") as f:
+                    manifest = json.load(f)
+            FileManager._manifests[folder_path] = manifest
+        return manifest
+
+    @staticmethod
+    def flush_manifests():
+        for folder_path in list(FileManager._dirty_manifests.keys()):
+            os.makedirs(folder_path, exist_ok=True)
+            manifest_path = os.path.join(folder_path, FileManager.MANIFEST_FILE_NAME)
+            # closed (and flushed) before it replaces the manifest
+            with open(f"{manifest_path}.tmp", "w") as f:
+                json.dump(FileManager._manifests[folder_path], f)
+            os.replace(f"{manifest_path}.tmp", manifest_path)
+            del FileManager._dirty_manifests[folder_path]
+
+    @staticmethod
+    def _set_manifest_entry(folder_path: str, name: str, entry: dict | None):
+        manifest = FileManager.read_manifest(folder_path)
+        if entry is None:
+            manifest.pop(name, None)
+        else:
+            manifest[name] = entry
+        FileManager._dirty_manifests[folder_path] = FileManager._dirty_manifests.get(folder_path, 0) + 1
+        if FileManager.MANIFEST_FLUSH_EVERY <= FileManager._dirty_manifests[folder_path]:
+            FileManager.flush_manifests()
+
+    @staticmethod
+    def _update_manifest(folder_path: str, name: str, df: pd.DataFrame | None):
+        file_path, storage = FileManager._resolve_daily_returns_path(folder_path, name)
+        if df is None or not os.path.exists(file_path):
+            FileManager._set_manifest_entry(folder_path, name, None)
+            return
+        min_date = df["date"].min()
+        max_date = df["date"].max()
+        last_return_index = None
+        if "return_index" in df.columns:
+            return_index = df["return_index"].dropna()
+            last_return_index = 1.0 if return_index.empty else float(return_index.iloc[-1])
+        FileManager._set_manifest_entry(
+            folder_path,
+            name,
+            {
+                "min_date": None if pd.isna(min_date) else min_date.strftime("%Y-%m-%d"),
+                "max_date": None if pd.isna(max_date) else max_date.strftime("%Y-%m-%d"),
+                "rows": len(df),
+                "storage": storage.value,
+                "fingerprint": FileManager._fingerprint(file_path),
+                "last_return_index": last_return_index,
+            },
         )
-        df["total_return"] = pd.to_numeric(df["total_return"], errors="coerce")
-        df["return_index"] = pd.to_numeric(df["return_index"], errors="coerce")
+
+    @staticmethod
+    def _manifest_entry(folder_path: str, name: str) -> dict | None:
+        entry = FileManager.read_manifest(folder_path).get(name, None)
+        if entry is None:
+            return None
+        file_path, storage = FileManager._resolve_daily_returns_path(folder_path, name)
+        if entry["storage"] != storage.value or not os.path.exists(file_path) or entry["fingerprint"] != FileManager._fingerprint(file_path):
+            return None
+        return entry
+
+    @staticmethod
+    def _read_daily_returns_coverage(folder_path: str, name: str) -> tuple[datetime | None, datetime | None]:
+        entry = FileManager._manifest_entry(folder_path, name)
+        if entry is None:
+            _, min_date, max_date = FileManager._read_daily_returns(folder_path, name, print_stuff=False)
+            return min_date, max_date
+        if entry["min_date"] is None or entry["max_date"] is None:
+            return None, None
+        return pd.Timestamp(entry["min_date"]), pd.Timestamp(entry["max_date"])
+
+    @staticmethod
+    def _read_daily_returns(folder_path: str, name: str, print_stuff: bool = True) -> tuple[pd.DataFrame | None, datetime | None, datetime | None]:
+        file_path, storage = FileManager._resolve_daily_returns_path(folder_path, name)
+        if not os.path.exists(file_path):
+            if print_stuff:
+                print()
+            return None, None, None
+        df = FileManager._read_return_file(file_path, storage, FileManager.DAILY_RETURN_READ_COLUMNS)
         df.set_index("date", drop=False, inplace=True)
+        if FileManager._manifest_entry(folder_path, name) is None:
+            FileManager._update_manifest(folder_path, name, df)
         min_date = df["date"].min()
         max_date = df["date"].max()
         if pd.isna(min_date) or pd.isna(max_date):
@@ -89,43 +250,150 @@ class FileManager:
     def read_daily_stock_returns(
         country_code: COUNTRY, RIC: str, print_stuff: bool = True
     ) -> tuple[pd.DataFrame | None, datetime | None, datetime | None]:
-        file_path = os.path.join(FileManager.FOLDER_DAILY_STOCK, country_code.value, f"{RIC}.csv")
+        folder_path = os.path.join(FileManager.FOLDER_DAILY_STOCK, country_code.value)
         if print_stuff:
             print(f"{country_code.value+":":<4} {RIC:<20} Read Daily Stock Return         ", end="")
-        return FileManager._read_daily_returns(file_path, print_stuff=print_stuff)
+        return FileManager._read_daily_returns(folder_path, RIC, print_stuff=print_stuff)
 
     @staticmethod
     def read_daily_risk_free_returns(country_code: COUNTRY, print_stuff: bool = True) -> tuple[pd.DataFrame | None, datetime | None, datetime | None]:
-        file_path = os.path.join(FileManager.FOLDER_DAILY_RISK_FREE_RETURNS, f"{country_code.value}.csv")
         if print_stuff:
             print(f"{country_code.value+":":<4}                      Read Risk Free Rates            ", end="")
-        return FileManager._read_daily_returns(file_path, print_stuff=print_stuff)
+        return FileManager._read_daily_returns(FileManager.FOLDER_DAILY_RISK_FREE_RETURNS, country_code.value, print_stuff=print_stuff)
 
     @staticmethod
     def read_daily_market_returns(country_code: COUNTRY, print_stuff: bool = True) -> tuple[pd.DataFrame | None, datetime | None, datetime | None]:
-        file_path = os.path.join(FileManager.FOLDER_DAILY_MARKET_RETURNS, f"{country_code.value}.csv")
         if print_stuff:
             print(f"{country_code.value+":":<4}                      Read Market Returns             ", end="")
-        return FileManager._read_daily_returns(file_path, print_stuff=print_stuff)
+        return FileManager._read_daily_returns(FileManager.FOLDER_DAILY_MARKET_RETURNS, country_code.value, print_stuff=print_stuff)
+
+    @staticmethod
+    def read_daily_stock_returns_coverage(country_code: COUNTRY, RIC: str) -> tuple[datetime | None, datetime | None]:
+        return FileManager._read_daily_returns_coverage(os.path.join(FileManager.FOLDER_DAILY_STOCK, country_code.value), RIC)
+
+    @staticmethod
+    def read_daily_risk_free_returns_coverage(country_code: COUNTRY) -> tuple[datetime | None, datetime | None]:
+        return FileManager._read_daily_returns_coverage(FileManager.FOLDER_DAILY_RISK_FREE_RETURNS, country_code.value)
 
     @staticmethod
-    def save_daily_returns(folder_path: str, file_name: str, df: pd.DataFrame):
+    def read_daily_market_returns_coverage(country_code: COUNTRY) -> tuple[datetime | None, datetime | None]:
+        return FileManager._read_daily_returns_coverage(FileManager.FOLDER_DAILY_MARKET_RETURNS, country_code.value)
+
+    @staticmethod
+    def read_daily_stock_returns_manifest(country_code: COUNTRY, RICs: list[str] | None = None, validate: bool = True) -> pd.DataFrame:
+        folder_path = os.path.join(FileManager.FOLDER_DAILY_STOCK, country_code.value)
+        manifest = FileManager.read_manifest(folder_path)
+        RICs = list(manifest.keys()) if RICs is None else RICs
+        rows = []
+        for ric in RICs:
+            entry = FileManager._manifest_entry(folder_path, ric) if validate else manifest.get(ric, None)
+            if entry is None and validate and os.path.exists(FileManager._resolve_daily_returns_path(folder_path, ric)[0]):
+                FileManager._read_daily_returns_coverage(folder_path, ric)
+                entry = manifest.get(ric, None)
+            rows.append({"RIC": ric} | ({} if entry is None else entry))
+        df = pd.DataFrame(rows, columns=["RIC", "min_date", "max_date", "rows", "storage", "fingerprint"])
+        df["min_date"] = pd.to_datetime(df["min_date"])
+        df["max_date"] = pd.to_datetime(df["max_date"])
+        return df.set_index("RIC", drop=False)
+
+    @staticmethod
+    def save_daily_returns(folder_path: str, name: str, df: pd.DataFrame):
         if not os.path.exists(folder_path):
             os.makedirs(folder_path, exist_ok=True)
-        file_path = os.path.join(folder_path, file_name)
+        file_path = FileManager._daily_returns_path(folder_path, name)
         df["return_index"] = df["total_return"].add(1).cumprod()
-        df.to_csv(file_path, sep=";", decimal=",", index=False, header=True)
+        FileManager._write_return_file(file_path, FileManager.RETURN_STORAGE, df)
+        FileManager._update_manifest(folder_path, name, df)
+
+    @staticmethod
+    def extend_daily_returns(folder_path: str, name: str, df_before: pd.DataFrame | None, df_after: pd.DataFrame | None):
+        df_before = None if df_before is None or df_before.empty else df_before
+        df_after = None if df_after is None or df_after.empty else df_after
+        if df_before is None and df_after is None:
+            return
+        file_path, storage = FileManager._resolve_daily_returns_path(folder_path, name)
+        if df_before is not None or storage is not FileManager.RETURN_STORAGE:
+            # a new head changes the return index of every stored row, so prepending is a full rewrite
+            df = FileManager._read_return_file(file_path, storage, FileManager.DAILY_RETURN_READ_COLUMNS)
+            FileManager.save_daily_returns(
+                folder_path=folder_path,
+                name=name,
+                df=pd.concat([d for d in [df_before, df, df_after] if d is not None], axis="index", ignore_index=True),
+            )
+            return
+
+        entry = FileManager._manifest_entry(folder_path, name)
+        if entry is None or entry.get("last_return_index", None) is None:
+            stored = FileManager._read_return_file(file_path, storage, FileManager.DAILY_RETURN_COLUMNS)
+            FileManager._update_manifest(folder_path, name, stored)
+            entry = FileManager._manifest_entry(folder_path, name)
+
+        # continue the stored cumprod of (1 + total_return) with the exact same sequence of multiplications
+        df_after = df_after.copy()
+        total_return = df_after["total_return"].to_numpy(dtype=np.float64)
+        missing = np.isnan(total_return)
+        return_index = np.cumprod(np.concatenate([[entry["last_return_index"]], np.where(missing, 1.0, total_return + 1.0)]))[1:]
+        return_index[missing] = np.nan
+        df_after["return_index"] = return_index
+
+        if storage is StorageFormat.CSV:
+            df_after.loc[:, FileManager.DAILY_RETURN_COLUMNS].to_csv(file_path, mode="a", sep=";", decimal=",", index=False, header=False)
+        else:
+            # columnar files cannot be appended in place, but the stored return index is reused as it is
+            stored = FileManager._read_return_file(file_path, storage, FileManager.DAILY_RETURN_COLUMNS)
+            FileManager._write_return_file(file_path, storage, pd.concat([stored, df_after.loc[:, FileManager.DAILY_RETURN_COLUMNS]], ignore_index=True))
+
+        max_date = df_after["date"].max()
+        valid_return_index = return_index[~missing]
+        FileManager._set_manifest_entry(
+            folder_path,
+            name,
+            entry
+            | {
+                "max_date": max(pd.Timestamp(entry["max_date"]), max_date).strftime("%Y-%m-%d"),
+                "rows": entry["rows"] + len(df_after),
+                "fingerprint": FileManager._fingerprint(file_path),
+                "last_return_index": entry["last_return_index"] if len(valid_return_index) == 0 else float(valid_return_index[-1]),
+            },
+        )
+
+    @staticmethod
+    def extend_daily_stock_returns(country_code: COUNTRY, RIC: str, df_before: pd.DataFrame | None, df_after: pd.DataFrame | None):
+        if (df_before is None or df_before.empty) and (df_after is None or df_after.empty):
+            return
+        folder_path = os.path.join(FileManager.FOLDER_DAILY_STOCK, country_code.value)
+        FileManager.extend_daily_returns(folder_path=folder_path, name=RIC, df_before=df_before, df_after=df_after)
+        FileManager.delete_return_panels(country_code=country_code)
+
+    @staticmethod
+    def extend_daily_risk_free_returns(country_code: COUNTRY, df_before: pd.DataFrame | None, df_after: pd.DataFrame | None):
+        FileManager.extend_daily_returns(
+            folder_path=FileManager.FOLDER_DAILY_RISK_FREE_RETURNS,
+            name=country_code.value,
+            df_before=df_before,
+            df_after=df_after,
+        )
+
+    @staticmethod
+    def extend_daily_market_returns(country_code: COUNTRY, df_before: pd.DataFrame | None, df_after: pd.DataFrame | None):
+        FileManager.extend_daily_returns(
+            folder_path=FileManager.FOLDER_DAILY_MARKET_RETURNS,
+            name=country_code.value,
+            df_before=df_before,
+            df_after=df_after,
+        )
 
     @staticmethod
     def save_daily_stock_returns(country_code: COUNTRY, RIC: str, df: pd.DataFrame):
         folder_path = os.path.join(FileManager.FOLDER_DAILY_STOCK, country_code.value)
-        FileManager.save_daily_returns(folder_path=folder_path, file_name=f"{RIC}.csv", df=df)
+        FileManager.save_daily_returns(folder_path=folder_path, name=RIC, df=df)
+        FileManager.delete_return_panels(country_code=country_code)
 
     @staticmethod
     def save_daily_risk_free_returns(country_code: COUNTRY, df: pd.DataFrame):
         FileManager.save_daily_returns(
             folder_path=FileManager.FOLDER_DAILY_RISK_FREE_RETURNS,
-            file_name=f"{country_code.value}.csv",
+            name=country_code.value,
             df=df,
         )
 
@@ -133,10 +401,79 @@ class FileManager:
     def save_daily_market_returns(country_code: COUNTRY, df: pd.DataFrame):
         FileManager.save_daily_returns(
             folder_path=FileManager.FOLDER_DAILY_MARKET_RETURNS,
-            file_name=f"{country_code.value}.csv",
+            name=country_code.value,
             df=df,
         )
 
+    @staticmethod
+    def _return_panel_folder(country_code: COUNTRY, start_date: datetime, end_date: datetime) -> str:
+        return os.path.join(
+            FileManager.FOLDER_RETURN_PANELS,
+            country_code.value,
+            f"{start_date.strftime('%Y-%m-%d')}_{end_date.strftime('%Y-%m-%d')}",
+        )
+
+    @staticmethod
+    def read_return_panel(country_code: COUNTRY, start_date: datetime, end_date: datetime, print_stuff: bool = True) -> ReturnPanel | None:
+        folder_path = FileManager._return_panel_folder(country_code, start_date, end_date)
+        if not os.path.exists(os.path.join(folder_path, "rics.txt")):
+            return None
+        if print_stuff:
+            print(f"{country_code.value+":":<4}                      Map Return Panel                ", end="")
+        panel = ReturnPanel(
+            start_date=start_date,
+            end_date=end_date,
+            dates=np.load(os.path.join(folder_path, "dates.npy")),
+            rics=open(os.path.join(folder_path, "rics.txt"), "r").read().splitlines(),
+            returns=np.load(os.path.join(folder_path, "returns.npy"), mmap_mode="r"),
+            valid=np.load(os.path.join(folder_path, "valid.npy"), mmap_mode="r"),
+            available=np.load(os.path.join(folder_path, "available.npy")),
+        )
+        if print_stuff:
+            print(f"{len(panel.rics)} RICs x {len(panel.dates)} dates")
+        return panel
+
+    @staticmethod
+    def save_return_panel(country_code: COUNTRY, panel: ReturnPanel):
+        folder_path = FileManager._return_panel_folder(country_code, panel.start_date, panel.end_date)
+        os.makedirs(folder_path, exist_ok=True)
+        np.save(os.path.join(folder_path, "dates.npy"), panel.dates)
+        np.save(os.path.join(folder_path, "returns.npy"), panel.returns)
+        np.save(os.path.join(folder_path, "valid.npy"), panel.valid)
+        np.save(os.path.join(folder_path, "available.npy"), panel.available)
+        # rics.txt is written last and marks the panel as complete
+        open(os.path.join(folder_path, "rics.txt"), "w").write("\n".join(panel.rics))
+
+    @staticmethod
+    def delete_return_panels(country_code: COUNTRY):
+        country_folder = os.path.join(FileManager.FOLDER_RETURN_PANELS, country_code.value)
+        if not os.path.exists(country_folder):
+            return
+        for panel_folder in os.listdir(country_folder):
+            rics_path = os.path.join(country_folder, panel_folder, "rics.txt")
+            if os.path.exists(rics_path):
+                os.remove(rics_path)
+
+    @staticmethod
+    def migrate_daily_returns(target: StorageFormat, source: StorageFormat = StorageFormat.CSV, delete_source: bool = False):
+        if target is source:
+            return
+        print(f"Migrate daily returns from {source.value} to {target.value}")
+        for root_folder in [FileManager.FOLDER_DAILY_STOCK, FileManager.FOLDER_DAILY_RISK_FREE_RETURNS, FileManager.FOLDER_DAILY_MARKET_RETURNS]:
+            for folder_path, _, file_names in os.walk(root_folder):
+                names = [f.removesuffix(f".{source.value}") for f in file_names if f.endswith(f".{source.value}") and not f.startswith("_")]
+                for i, name in enumerate(names):
+                    print(f"\t{os.path.relpath(folder_path, FileManager.FOLDER_DATA):<30} {name:<20} {i + 1:>5}/{len(names):<5}")
+                    source_path = FileManager._daily_returns_path(folder_path, name, source)
+                    df = FileManager._read_return_file(source_path, source, FileManager.DAILY_RETURN_COLUMNS)
+                    FileManager._write_return_file(FileManager._daily_returns_path(folder_path, name, target), target, df)
+                    if delete_source:
+                        os.remove(source_path)
+                    if target is FileManager.RETURN_STORAGE or delete_source:
+                        FileManager._update_manifest(folder_path, name, df)
+        FileManager.flush_manifests()
+        print("Migration done")
+
     @staticmethod
     def load_no_esg_data_list(country_code: COUNTRY) -> list[str]:
         filepath = os.path.join(FileManager.FOLDER_ESG_DATA, country_code.value, "_no_data_list.txt")
@@ -153,6 +490,10 @@ class FileManager:
         filepath = os.path.join(dir_folder, "_no_data_list.txt")
         open(filepath, "w").write("\n".join(no_esg_data_list))
 
+    @staticmethod
+    def esg_data_exists(country_code: COUNTRY, RIC: str) -> bool:
+        return os.path.exists(os.path.join(FileManager.FOLDER_ESG_DATA, country_code.value, f"{RIC}.csv"))
+
     @staticmethod
     def read_esg_data(
         country_code: COUNTRY,
@@ -207,6 +548,10 @@ class FileManager:
         filepath = os.path.join(dir_folder, "_no_fundamentals_list.txt")
         open(filepath, "w").write("\n".join(no_fundamentals_list))
 
+    @staticmethod
+    def fundamentals_exist(country_code: COUNTRY, RIC: str) -> bool:
+        return os.path.exists(os.path.join(FileManager.FOLDER_FUNDAMENTALS, country_code.value, f"{RIC}.csv"))
+
     @staticmethod
     def read_fundamentals(
         country_code: COUNTRY,
@@ -289,3 +634,16 @@ class FileManager:
                     break
                 except:
                     print(f"Fail")
+
+
+atexit.register(FileManager.flush_manifests)
+
+
+if __name__ == "__main__":
+    # python -m data_managemant.FileManager [target] [source] [--delete]
+    formats = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    FileManager.migrate_daily_returns(
+        target=StorageFormat(formats[0]) if 0 < len(formats) else StorageFormat.PARQUET,
+        source=StorageFormat(formats[1]) if 1 < len(formats) else StorageFormat.CSV,
+        delete_source="--delete" in sys.argv[1:],
+    )
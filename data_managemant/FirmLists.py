@@ -13,6 +13,8 @@ class FirmLists:
         self._raw_firm_lists = None
         self._extended_firm_lists = None
         self._clean_firm_lists = None
+        self._firm_meta: dict[str, tuple[pd.DataFrame, dict[str, int], set[str]]] = {}
+        self._dead_dates: dict[tuple[str, bool], pd.Series] = {}
 
     @property
     def raw_firm_lists(self) -> dict[str, pd.DataFrame]:
@@ -41,6 +43,8 @@ class FirmLists:
         return self._clean_firm_lists
 
     def create_extend_firm_list(self, save_as_file: bool) -> dict[str, pd.DataFrame]:
+        if self.lseg_downloader is None:
+            raise FileNotFoundError(f"No extended firm list at {FileManager.PATH_EXTENDED_FIRM_LISTS} and no downloader to create it (offline)")
         print("Create extended firm list")
         raw_firm_lists = FileManager.load_raw_firm_lists()
         extended_firm_lists = {}
@@ -72,6 +76,8 @@ class FirmLists:
         for country_code, firm_list in extended_firm_list.items():
             delisting_information = [col for col in FirmLists.DELISTING_COLS if col not in firm_list.columns]
             if 0 < len(delisting_information):
+                if self.lseg_downloader is None:
+                    raise FileNotFoundError(f"{country_code}: extended firm list has no {delisting_information} and no downloader to add it (offline)")
                 additional_info = self.lseg_downloader.delisting_data(RIC=firm_list["RIC"].dropna(), delisting_data_cols=delisting_information)
                 country_df = pd.merge(left=firm_list, right=additional_info, left_on="RIC", right_index=True, how="left")
                 extended_firm_list[country_code] = country_df
@@ -79,13 +85,37 @@ class FirmLists:
             FileManager.save_extended_firm_list(extended_firm_list)
         return extended_firm_list
 
+    def _firm_meta_index(self, country: COUNTRY) -> tuple[pd.DataFrame, dict[str, int], set[str]]:
+        if self._firm_meta.get(country.value, None) is None:
+            country_df = self.clean_firm_lists[country.value].set_index("RIC", drop=False)
+            duplicated = country_df.index.duplicated(keep=False)
+            positions = {ric: i for i, ric in enumerate(country_df.index) if not duplicated[i]}
+            self._firm_meta[country.value] = (country_df, positions, set(country_df.index[duplicated]))
+        return self._firm_meta[country.value]
+
+    def get_firm_meta(self, country: COUNTRY, RIC: str) -> pd.Series:
+        country_df, positions, duplicates = self._firm_meta_index(country)
+        position = positions.get(RIC, None)
+        if position is None:
+            if RIC in duplicates:
+                raise ValueError(f"{country.value}: RIC {RIC} appears {int((country_df.index == RIC).sum())} times in the extended firm list")
+            raise KeyError(f"{country.value}: RIC {RIC} is not in the extended firm list")
+        return country_df.iloc[position]
+
+    def _get_dead_dates(self, country: COUNTRY, use_dead_list: bool) -> pd.Series:
+        if self._dead_dates.get((country.value, use_dead_list), None) is None:
+            country_df = self.clean_firm_lists[country.value]
+            if use_dead_list and "DEAD DATE" in country_df.columns:
+                col = "DEAD DATE"
+                col_format = None
+            else:
+                col = "DelistedDate"
+                col_format = "%B %Y"
+            self._dead_dates[(country.value, use_dead_list)] = pd.to_datetime(country_df[col], format=col_format)
+        return self._dead_dates[(country.value, use_dead_list)]
+
     def get_county_firm_rics_without_dead_firms(self, country: COUNTRY, dead_date: datetime, use_dead_list: bool = False) -> pd.Series:
         country_df = self.clean_firm_lists[country.value]
-        if use_dead_list and "DEAD DATE" in country_df.columns:
-            col = "DEAD DATE"
-            col_format = None
-        else:
-            col = "DelistedDate"
-            col_format = "%B %Y"
-        country_df = country_df[country_df[col].isna() | (dead_date < pd.to_datetime(country_df[col], format=col_format))].reset_index(drop=True)
+        dead_dates = self._get_dead_dates(country, use_dead_list)
+        country_df = country_df[dead_dates.isna() | (dead_date < dead_dates)].reset_index(drop=True)
         return country_df["RIC"]
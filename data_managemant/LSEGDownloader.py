@@ -1,6 +1,7 @@
 import math
 import os
-import time
+import threading
+from collections.abc import Iterator
 from datetime import datetime, timedelta
 from enum import Enum
 
@@ -8,7 +9,8 @@ import lseg.data as ld
 import numpy as np
 import pandas as pd
 from dotenv import load_dotenv
-from lseg.data.content import search
+
+from data_managemant.DownloadScheduler import DownloadScheduler
 
 
 class LSEGInterval(Enum):
@@ -23,50 +25,92 @@ class LSEGInterval(Enum):
 
 
 class LSEGDataDownloader:
-    def __init__(self, print_stuff: bool = True):
+    TOTAL_RETURN_FIELDS: list[str] = ["TR.TotalReturn"]
+    FUNDAMENTAL_FIELDS: list[str] = [
+        "TR.CompanyMarketCap",
+        "TR.F.TotShHoldEq",
+        "TR.F.EBIT",
+        "TR.F.IntrExpn",
+        "TR.F.TotAssets",
+    ]
+    ESG_FIELDS: list[str] = [
+        "TR.TRESGScore",
+        "TR.TRESGCScore",
+        "TR.TRESGCControversiesScore",
+        "TR.SocialPillarScore",
+        "TR.GovernancePillarScore",
+        "TR.EnvironmentPillarScore",
+        "TR.TRESGResourceUseScore",
+        "TR.TRESGEmissionsScore",
+        "TR.TRESGInnovationScore",
+        "TR.TRESGWorkforceScore",
+        "TR.TRESGHumanRightsScore",
+        "TR.TRESGCommunityScore",
+        "TR.TRESGProductResponsibilityScore",
+        "TR.TRESGManagementScore",
+        "TR.TRESGShareholdersScore",
+        "TR.TRESGCSRStrategyScore",
+    ]
+
+    def __init__(self, print_stuff: bool = True, scheduler: DownloadScheduler | None = None, backend=None):
         self.print_stuff = print_stuff
+        self.scheduler = DownloadScheduler(print_stuff=print_stuff) if scheduler is None else scheduler
+        # backend is the lseg.data module or a stand-in with the same surface (see LSEGReplay)
+        self.backend = ld if backend is None else backend
+        self.search = self.backend.content.search
+        # the platform session is only created when the first request actually needs it
+        self.session = None
+        self._session_lock = threading.Lock()
+
+    def _create_session(self):
         load_dotenv()
         api_key = os.getenv("api_key")
         ldp_login = os.getenv("ldp_login")
         ldp_password = os.getenv("ldp_password")
-        self.session = ld.session.platform.Definition(
+        self.session = self.backend.session.platform.Definition(
             signon_control=True,
             app_key=api_key,
-            grant=ld.session.platform.GrantPassword(
+            grant=self.backend.session.platform.GrantPassword(
                 username=ldp_login,
                 password=ldp_password,
             ),
         ).get_session()
-        ld.session.set_default(self.session)
+        self.backend.session.set_default(self.session)
 
     def is_open(self) -> bool:
-        return self.session.open_state is ld.OpenState.Opened
+        return self.session is not None and self.session.open_state is self.backend.OpenState.Opened
 
     def is_closed(self) -> bool:
-        return self.session.open_state is ld.OpenState.Closed
+        return self.session is None or self.session.open_state is self.backend.OpenState.Closed
 
     def open(self) -> None:
         if self.is_open():
             return None
-        print("Open data downloader session")
-        self.session.open()
+        # downloads run on scheduler threads, so only one of them may create and open the session
+        with self._session_lock:
+            if self.is_open():
+                return None
+            if self.session is None:
+                self._create_session()
+            print("Open data downloader session")
+            self.session.open()
         return None
 
     @property
     def ld(self):
         if self.is_closed():
             self.open()
-        return ld
+        return self.backend
 
     def close(self):
         if self.is_closed():
             return None
         print("Close data downloader session")
-        ld.close_session()
+        self.backend.close_session()
 
     def metadata_views(self) -> pd.DataFrame:
         self.open()
-        response = search.metadata.Definition(view=search.Views.SEARCH_ALL).get_data()  # Required parameter
+        response = self.search.metadata.Definition(view=self.search.Views.SEARCH_ALL).get_data()  # Required parameter
         df = response.data.df
         return df
 
@@ -94,8 +138,8 @@ class LSEGDataDownloader:
             if self.print_stuff:
                 print(f"\tLoad chunk {i + 1}/{len(chunks)} ", end="")
             dfs.append(
-                search.lookup.Definition(
-                    view=search.Views.SEARCH_ALL,
+                self.search.lookup.Definition(
+                    view=self.search.Views.SEARCH_ALL,
                     scope=identifier,
                     terms=",".join(chunk),
                     select=select,
@@ -199,22 +243,21 @@ class LSEGDataDownloader:
         if self.print_stuff:
             print(f"     {ric_str:<20} Download {func_name}")
         self.open()
-        for i in range(5):
-            try:
-                df = ld.get_data(
+        try:
+            df = self.scheduler.run(
+                lambda: self.backend.get_data(
                     universe=RIC,
                     fields=fields,
-                )
-                if df is None:
-                    return pd.DataFrame()
-                return df
-            except Exception as e:
-                if self.print_stuff:
-                    print(f"     {ric_str:<20} Error while downloading {func_name} - try {i + 1}/5:")
-                time.sleep(0.5)
-        if self.print_stuff:
-            print(f"     {ric_str:<20} No useful {func_name} download")
-        return None
+                ),
+                description=ric_str,
+            )
+        except Exception:
+            if self.print_stuff:
+                print(f"     {ric_str:<20} No useful {func_name} download")
+            return None
+        if df is None:
+            return pd.DataFrame()
+        return df
 
     def get_history(
         self,
@@ -253,25 +296,24 @@ class LSEGDataDownloader:
         if self.print_stuff:
             print(f"     {ric_str:<20} Download {func_name} from {start_date_str} till {end_date_str}")
         self.open()
-        for i in range(5):
-            try:
-                df = ld.get_history(
+        try:
+            df = self.scheduler.run(
+                lambda: self.backend.get_history(
                     universe=RIC,
                     fields=fields,
                     interval=interval.value,
                     start=start_date,
                     end=end_date,
-                )
-                if df is None:
-                    return pd.DataFrame()
-                return df
-            except Exception as e:
-                if self.print_stuff:
-                    print(f"     {ric_str:<20} Error while downloading {func_name} - try {i + 1}/5:")
-                time.sleep(0.5)
-        if self.print_stuff:
-            print(f"     {ric_str:<20} No useful {func_name} download")
-        return None
+                ),
+                description=ric_str,
+            )
+        except Exception:
+            if self.print_stuff:
+                print(f"     {ric_str:<20} No useful {func_name} download")
+            return None
+        if df is None:
+            return pd.DataFrame()
+        return df
 
     def get_total_return(
         self,
@@ -282,7 +324,7 @@ class LSEGDataDownloader:
     ) -> pd.DataFrame | None:
         df = self.get_history(
             RIC=RIC,
-            fields=["TR.TotalReturn"],
+            fields=LSEGDataDownloader.TOTAL_RETURN_FIELDS,
             interval=interval,
             start_date=start_date,
             end_date=end_date,
@@ -290,7 +332,12 @@ class LSEGDataDownloader:
         )
         if df is None:
             return None
+        return LSEGDataDownloader._format_total_return(df, start_date=start_date, end_date=end_date)
 
+    @staticmethod
+    def _format_total_return(df: pd.DataFrame, start_date: datetime, end_date: datetime) -> pd.DataFrame | None:
+        if "Total Return" not in df.columns:
+            return None
         df = (
             df.reindex(pd.date_range(start=start_date, end=end_date, freq="D"), fill_value=0)
             .reset_index(drop=False)
@@ -300,6 +347,99 @@ class LSEGDataDownloader:
         df["total_return"] = pd.to_numeric(df["total_return"], errors="coerce") / 100
         return df
 
+    @staticmethod
+    def _split_universe(
+        df: pd.DataFrame | None,
+        RICs: list[str],
+        single_field_name: str | None = None,
+        drop_empty_rows: bool = True,
+    ) -> dict[str, pd.DataFrame | None]:
+        if df is None:
+            return {ric: None for ric in RICs}
+        if len(RICs) == 1:
+            return {RICs[0]: df}
+        frames = {}
+        for ric in RICs:
+            if isinstance(df.columns, pd.MultiIndex):
+                ric_df = df[ric] if ric in df.columns.get_level_values(0) else pd.DataFrame(index=df.index)
+            elif single_field_name is not None:
+                ric_df = df[[ric]].rename(columns={ric: single_field_name}) if ric in df.columns else pd.DataFrame(index=df.index)
+            else:
+                raise AttributeError(f"Cannot split columns {list(df.columns)} into {RICs}")
+            # rows of the other RICs in the chunk are not part of this RIC's own history, except for a daily series
+            # whose missing values on the response's dates have to stay missing
+            frames[ric] = ric_df.dropna(axis="index", how="all") if drop_empty_rows else ric_df
+        return frames
+
+    @staticmethod
+    def plan_chunks(
+        needs: list[tuple[str, datetime, datetime]],
+        chunk_size: int = 50,
+    ) -> list[tuple[list[str], datetime, datetime]]:
+        windows: dict[tuple[datetime, datetime], list[str]] = {}
+        for ric, start_date, end_date in needs:
+            rics = windows.setdefault((start_date, end_date), [])
+            if ric not in rics:
+                rics.append(ric)
+        chunks = []
+        for (start_date, end_date), rics in windows.items():
+            for i in range(0, len(rics), chunk_size):
+                chunks.append((rics[i : i + chunk_size], start_date, end_date))
+        return chunks
+
+    def get_total_return_chunk(
+        self,
+        RICs: list[str],
+        start_date: datetime,
+        end_date: datetime,
+        interval: LSEGInterval = LSEGInterval.DAILY,
+    ) -> dict[str, pd.DataFrame | None]:
+        df = self.get_history(
+            RIC=RICs,
+            fields=LSEGDataDownloader.TOTAL_RETURN_FIELDS,
+            interval=interval,
+            start_date=start_date,
+            end_date=end_date,
+            func_name="Total Return          ",
+        )
+        return LSEGDataDownloader._split_total_returns(df, RICs, start_date=start_date, end_date=end_date)
+
+    @staticmethod
+    def _split_total_returns(df: pd.DataFrame | None, RICs: list[str], start_date: datetime, end_date: datetime) -> dict[str, pd.DataFrame | None]:
+        frames = LSEGDataDownloader._split_universe(df, RICs, single_field_name="Total Return", drop_empty_rows=False)
+        return {
+            # a RIC without a single value in the chunk (dead or invalid) has no returns, not a window of zeros
+            ric: (
+                None
+                if ric_df is None or "Total Return" not in ric_df.columns or ric_df["Total Return"].isna().all()
+                else LSEGDataDownloader._format_total_return(ric_df, start_date=start_date, end_date=end_date)
+            )
+            for ric, ric_df in frames.items()
+        }
+
+    def iter_total_return_bulk(
+        self,
+        needs: list[tuple[str, datetime, datetime]],
+        chunk_size: int = 50,
+        interval: LSEGInterval = LSEGInterval.DAILY,
+    ) -> Iterator[dict[tuple[str, datetime, datetime], pd.DataFrame | None]]:
+        chunks = LSEGDataDownloader.plan_chunks(needs, chunk_size=chunk_size)
+        tasks = {i: (self.get_total_return_chunk, (RICs, start_date, end_date, interval), {}) for i, (RICs, start_date, end_date) in enumerate(chunks)}
+        for i, chunk_result in self.scheduler.as_completed(tasks):
+            _, start_date, end_date = chunks[i]
+            yield {(ric, start_date, end_date): df for ric, df in chunk_result.items()}
+
+    def get_total_return_bulk(
+        self,
+        needs: list[tuple[str, datetime, datetime]],
+        chunk_size: int = 50,
+        interval: LSEGInterval = LSEGInterval.DAILY,
+    ) -> dict[tuple[str, datetime, datetime], pd.DataFrame | None]:
+        results = {}
+        for chunk_result in self.iter_total_return_bulk(needs, chunk_size=chunk_size, interval=interval):
+            results |= chunk_result
+        return results
+
     def get_over_night_rates(
         self,
         RIC: str | list[str],
@@ -404,13 +544,7 @@ class LSEGDataDownloader:
     ):
         df = self.get_history(
             RIC=RIC,
-            fields=[
-                "TR.CompanyMarketCap",
-                "TR.F.TotShHoldEq",
-                "TR.F.EBIT",
-                "TR.F.IntrExpn",
-                "TR.F.TotAssets",
-            ],
+            fields=LSEGDataDownloader.FUNDAMENTAL_FIELDS,
             interval=LSEGInterval.YEARLY,
             start_date="2000",
             end_date="2030",
@@ -418,7 +552,10 @@ class LSEGDataDownloader:
         )
         if df is None:
             return None
+        return LSEGDataDownloader._format_fundamentals(df)
 
+    @staticmethod
+    def _format_fundamentals(df: pd.DataFrame) -> pd.DataFrame:
         df = (
             df.astype("float")
             .ffill()
@@ -440,30 +577,50 @@ class LSEGDataDownloader:
         df["date"] = pd.to_datetime(df["date"])
         return df
 
+    def iter_fundamentals_bulk(
+        self,
+        RICs: list[str],
+        chunk_size: int = 50,
+    ) -> Iterator[dict[str, pd.DataFrame | None]]:
+        chunks = LSEGDataDownloader.plan_chunks([(ric, None, None) for ric in RICs], chunk_size=chunk_size)
+        tasks = {i: (self.get_fundamentals_chunk, (chunk,), {}) for i, (chunk, _, _) in enumerate(chunks)}
+        for _, chunk_result in self.scheduler.as_completed(tasks):
+            yield chunk_result
+
+    def get_fundamentals_bulk(
+        self,
+        RICs: list[str],
+        chunk_size: int = 50,
+    ) -> dict[str, pd.DataFrame | None]:
+        results = {}
+        for chunk_result in self.iter_fundamentals_bulk(RICs, chunk_size=chunk_size):
+            results |= chunk_result
+        return results
+
+    def get_fundamentals_chunk(
+        self,
+        RICs: list[str],
+    ) -> dict[str, pd.DataFrame | None]:
+        df = self.get_history(
+            RIC=RICs,
+            fields=LSEGDataDownloader.FUNDAMENTAL_FIELDS,
+            interval=LSEGInterval.YEARLY,
+            start_date="2000",
+            end_date="2030",
+            func_name="Fundamentals          ",
+        )
+        return {
+            ric: None if ric_df is None else LSEGDataDownloader._format_fundamentals(ric_df)
+            for ric, ric_df in LSEGDataDownloader._split_universe(df, RICs).items()
+        }
+
     def get_full_esg_data(
         self,
         RIC: str,
     ) -> pd.DataFrame | None:
         df = self.get_history(
             RIC=RIC,
-            fields=[
-                "TR.TRESGScore",
-                "TR.TRESGCScore",
-                "TR.TRESGCControversiesScore",
-                "TR.SocialPillarScore",
-                "TR.GovernancePillarScore",
-                "TR.EnvironmentPillarScore",
-                "TR.TRESGResourceUseScore",
-                "TR.TRESGEmissionsScore",
-                "TR.TRESGInnovationScore",
-                "TR.TRESGWorkforceScore",
-                "TR.TRESGHumanRightsScore",
-                "TR.TRESGCommunityScore",
-                "TR.TRESGProductResponsibilityScore",
-                "TR.TRESGManagementScore",
-                "TR.TRESGShareholdersScore",
-                "TR.TRESGCSRStrategyScore",
-            ],
+            fields=LSEGDataDownloader.ESG_FIELDS,
             interval=LSEGInterval.YEARLY,
             start_date="2000",
             end_date="2030",
@@ -471,13 +628,53 @@ class LSEGDataDownloader:
         )
         if df is None:
             return None
+        return LSEGDataDownloader._format_esg_data(df)
 
-        df.dropna(axis="index", how="all", inplace=True)
+    @staticmethod
+    def _format_esg_data(df: pd.DataFrame) -> pd.DataFrame:
+        df = df.dropna(axis="index", how="all")
         df = df.reset_index(drop=False)
         df = df.rename(columns=lambda x: str(x).replace(" ", "_").lower())
         df["date"] = pd.to_datetime(df["date"])
         return df
 
+    def iter_full_esg_data_bulk(
+        self,
+        RICs: list[str],
+        chunk_size: int = 50,
+    ) -> Iterator[dict[str, pd.DataFrame | None]]:
+        chunks = LSEGDataDownloader.plan_chunks([(ric, None, None) for ric in RICs], chunk_size=chunk_size)
+        tasks = {i: (self.get_full_esg_data_chunk, (chunk,), {}) for i, (chunk, _, _) in enumerate(chunks)}
+        for _, chunk_result in self.scheduler.as_completed(tasks):
+            yield chunk_result
+
+    def get_full_esg_data_bulk(
+        self,
+        RICs: list[str],
+        chunk_size: int = 50,
+    ) -> dict[str, pd.DataFrame | None]:
+        results = {}
+        for chunk_result in self.iter_full_esg_data_bulk(RICs, chunk_size=chunk_size):
+            results |= chunk_result
+        return results
+
+    def get_full_esg_data_chunk(
+        self,
+        RICs: list[str],
+    ) -> dict[str, pd.DataFrame | None]:
+        df = self.get_history(
+            RIC=RICs,
+            fields=LSEGDataDownloader.ESG_FIELDS,
+            interval=LSEGInterval.YEARLY,
+            start_date="2000",
+            end_date="2030",
+            func_name="ESG DATA              ",
+        )
+        return {
+            ric: None if ric_df is None else LSEGDataDownloader._format_esg_data(ric_df)
+            for ric, ric_df in LSEGDataDownloader._split_universe(df, RICs).items()
+        }
+
     def get_yield_curve(
         self,
         curve_RIC: str,
@@ -486,7 +683,7 @@ class LSEGDataDownloader:
         interval: LSEGInterval,
     ) -> pd.DataFrame | None:
         self.open()
-        RIC = ld.discovery.Chain(curve_RIC).constituents
+        RIC = self.backend.discovery.Chain(curve_RIC).constituents
         curves = self.get_history(
             RIC=RIC,
             fields=["TR.MIDYIELD"],
@@ -0,0 +1,275 @@
+import hashlib
+import os
+import random
+import threading
+import time
+import zlib
+from datetime import datetime
+from enum import Enum
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from data_managemant.FileManager import FileManager
+
+
+class ReplayOpenState(Enum):
+    Opened = "Opened"
+    Closed = "Closed"
+
+
+class ReplaySession:
+    def __init__(self):
+        self.open_state = ReplayOpenState.Closed
+
+    def open(self):
+        self.open_state = ReplayOpenState.Opened
+
+    def close(self):
+        self.open_state = ReplayOpenState.Closed
+
+
+class LSEGReplay:
+    # display names the platform returns as column headers for the fields used in LSEGDataDownloader
+    FIELD_NAMES: dict[str, str] = {
+        "TR.TOTALRETURN": "Total Return",
+        "TR.FIXINGVALUE": "Fixing Value",
+        "TR.PRICECLOSE": "Price Close",
+        "TR.MIDYIELD": "Mid Yield",
+        "TR.COMPANYMARKETCAP": "Company Market Cap",
+        "TR.F.TOTSHHOLDEQ": "Total Shareholders' Equity incl Minority Intr & Hybrid Debt",
+        "TR.F.EBIT": "Earnings before Interest & Taxes (EBIT)",
+        "TR.F.INTREXPN": "Interest Expense",
+        "TR.F.TOTASSETS": "Total Assets",
+        "TR.TRESGSCORE": "ESG Score",
+        "TR.TRESGCSCORE": "ESG Combined Score",
+        "TR.TRESGCCONTROVERSIESSCORE": "ESG Controversies Score",
+        "TR.SOCIALPILLARSCORE": "Social Pillar Score",
+        "TR.GOVERNANCEPILLARSCORE": "Governance Pillar Score",
+        "TR.ENVIRONMENTPILLARSCORE": "Environmental Pillar Score",
+        "TR.TRESGRESOURCEUSESCORE": "Resource Use Score",
+        "TR.TRESGEMISSIONSSCORE": "Emissions Score",
+        "TR.TRESGINNOVATIONSCORE": "Environmental Innovation Score",
+        "TR.TRESGWORKFORCESCORE": "Workforce Score",
+        "TR.TRESGHUMANRIGHTSSCORE": "Human Rights Score",
+        "TR.TRESGCOMMUNITYSCORE": "Community Score",
+        "TR.TRESGPRODUCTRESPONSIBILITYSCORE": "Product Responsibility Score",
+        "TR.TRESGMANAGEMENTSCORE": "Management Score",
+        "TR.TRESGSHAREHOLDERSSCORE": "Shareholders Score",
+        "TR.TRESGCSRSTRATEGYSCORE": "CSR Strategy Score",
+    }
+    INTERVAL_FREQ: dict[str, str] = {
+        "daily": "B",
+        "weekly": "W-FRI",
+        "monthly": "ME",
+        "quarterly": "QE",
+        "yearly": "YE",
+    }
+    CALENDAR_START: datetime = datetime(1990, 1, 1)
+    INDUSTRIES: list[str] = [
+        "Industrials/Machinery",
+        "Financial Services and Real Estate/Banks",
+        "Basic Industries/Chemicals",
+        "Consumer Goods/Food",
+        "Technology/Software",
+        "Utilities/Electric",
+    ]
+
+    def __init__(
+        self,
+        folder: str | None = None,
+        backend=None,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        synthetic: bool = True,
+        seed: int = 0,
+    ):
+        self.folder = FileManager.FOLDER_LSEG_RECORDINGS if folder is None else folder
+        self.recording = backend is not None
+        self.recorded_backend = backend
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.throttle_rate = throttle_rate
+        self.synthetic = synthetic
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.num_calls = 0
+
+        if self.recording:
+            self.session = backend.session
+            self.OpenState = backend.OpenState
+            self.close_session = backend.close_session
+        else:
+            self.OpenState = ReplayOpenState
+            self.session = SimpleNamespace(
+                platform=SimpleNamespace(
+                    Definition=lambda **_: SimpleNamespace(get_session=ReplaySession),
+                    GrantPassword=lambda **_: None,
+                ),
+                set_default=lambda session: None,
+            )
+            self.close_session = lambda: None
+        self.discovery = SimpleNamespace(Chain=lambda name: SimpleNamespace(constituents=self._chain_constituents(name)))
+        self.content = SimpleNamespace(
+            search=SimpleNamespace(
+                Views=SimpleNamespace(SEARCH_ALL="SearchAll"),
+                lookup=SimpleNamespace(Definition=lambda **kwargs: self._response(self._lookup(**kwargs))),
+                metadata=SimpleNamespace(Definition=lambda **kwargs: self._response(self._metadata(**kwargs))),
+            )
+        )
+
+    @staticmethod
+    def _response(df: pd.DataFrame) -> SimpleNamespace:
+        return SimpleNamespace(get_data=lambda: SimpleNamespace(data=SimpleNamespace(df=df)))
+
+    @staticmethod
+    def _as_list(values) -> list[str]:
+        if isinstance(values, str):
+            return values.split(",")
+        return [str(value) for value in values]
+
+    @staticmethod
+    def _as_timestamp(value, year_end: bool) -> pd.Timestamp:
+        if isinstance(value, (int, float)) or (isinstance(value, str) and len(value) == 4):
+            return pd.Timestamp(int(value), 12, 31) if year_end else pd.Timestamp(int(value), 1, 1)
+        return pd.Timestamp(value)
+
+    def _path(self, func_name: str, key: tuple) -> str:
+        return os.path.join(self.folder, func_name, f"{hashlib.sha1(repr(key).encode()).hexdigest()}.pkl")
+
+    def _simulate_network(self):
+        with self._lock:
+            self.num_calls += 1
+            delay = self.latency + self._random.uniform(0, self.latency_jitter)
+            throttled = self._random.random() < self.throttle_rate
+        if 0 < delay:
+            time.sleep(delay)
+        if throttled:
+            raise RuntimeError("Error code 429 | Too many requests")
+
+    def _serve(self, func_name: str, key: tuple, record, synthesize) -> pd.DataFrame:
+        path = self._path(func_name, key)
+        if self.recording:
+            df = record()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            pd.to_pickle(df, path)
+            return df
+        self._simulate_network()
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+        if not self.synthetic:
+            raise LookupError(f"No recorded response for {func_name}{key}")
+        return synthesize()
+
+    def _rng(self, *parts) -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(repr(parts).encode())])
+
+    def get_history(self, universe, fields, interval: str = "daily", start=None, end=None, **kwargs) -> pd.DataFrame:
+        universe = self._as_list(universe)
+        fields = self._as_list(fields)
+        key = (tuple(universe), tuple(fields), interval, str(start), str(end))
+        return self._serve(
+            "get_history",
+            key,
+            lambda: self.recorded_backend.get_history(universe=universe, fields=fields, interval=interval, start=start, end=end, **kwargs),
+            lambda: self._synthetic_history(universe, fields, interval, start, end),
+        )
+
+    def get_data(self, universe, fields, **kwargs) -> pd.DataFrame:
+        universe = self._as_list(universe)
+        fields = self._as_list(fields)
+        return self._serve(
+            "get_data",
+            (tuple(universe), tuple(fields)),
+            lambda: self.recorded_backend.get_data(universe=universe, fields=fields, **kwargs),
+            lambda: pd.DataFrame(
+                {"Instrument": universe} | {self.FIELD_NAMES.get(field.upper(), field): [None] * len(universe) for field in fields},
+            ),
+        )
+
+    def _chain_constituents(self, name: str) -> list[str]:
+        df = self._serve(
+            "chain",
+            (name,),
+            lambda: pd.DataFrame({"constituents": self.recorded_backend.discovery.Chain(name).constituents}),
+            lambda: pd.DataFrame({"constituents": [f"{name}{maturity}Y=" for maturity in [1, 2, 3, 5, 7, 10, 20, 30]]}),
+        )
+        return df["constituents"].to_list()
+
+    def _lookup(self, view, scope: str, terms: str, select: str) -> pd.DataFrame:
+        terms = self._as_list(terms)
+        select = self._as_list(select)
+        return self._serve(
+            "lookup",
+            (scope, tuple(terms), tuple(select)),
+            lambda: self.recorded_backend.content.search.lookup.Definition(view=view, scope=scope, terms=",".join(terms), select=",".join(select))
+            .get_data()
+            .data.df,
+            lambda: self._synthetic_lookup(scope, terms, select),
+        )
+
+    def _metadata(self, view) -> pd.DataFrame:
+        return self._serve(
+            "metadata",
+            (str(view),),
+            lambda: self.recorded_backend.content.search.metadata.Definition(view=view).get_data().data.df,
+            lambda: pd.DataFrame(columns=["Type", "Searchable", "Sortable", "Navigable", "Groupable", "Exact", "Symbol"]),
+        )
+
+    def _synthetic_lookup(self, scope: str, terms: list[str], select: list[str]) -> pd.DataFrame:
+        rows = {}
+        for term in terms:
+            rng = self._rng("lookup", term)
+            industry = self.INDUSTRIES[int(rng.integers(len(self.INDUSTRIES)))]
+            row = {column: None for column in select}
+            if "RIC" in row:
+                row["RIC"] = term if scope in ["RIC", "PrimaryRIC"] else f"{term}.SY"
+            if "LocalScheme" in row:
+                row["LocalScheme"] = industry
+            if "RbssSchemeName" in row:
+                row["RbssSchemeName"] = industry.split("/")[-1]
+            if "DsQuotationNumber" in row:
+                row["DsQuotationNumber"] = term
+            rows[term] = row
+        return pd.DataFrame.from_dict(rows, orient="index", columns=select)
+
+    def _synthetic_values(self, RIC: str, field: str, dates: pd.DatetimeIndex) -> np.ndarray:
+        rng = self._rng("history", RIC, field)
+        n = len(dates)
+        if field == "TR.TOTALRETURN":
+            return rng.normal(0.03, 1.5, n)
+        if field == "TR.FIXINGVALUE":
+            return 2.0 + np.cumsum(rng.normal(0, 0.01, n))
+        if field in ["TR.PRICECLOSE", "TR.MIDYIELD"]:
+            return 1000 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, n)))
+        if field == "TR.COMPANYMARKETCAP":
+            return rng.lognormal(20, 1.5) * np.exp(np.cumsum(rng.normal(0.03, 0.2, n)))
+        if field in ["TR.F.TOTSHHOLDEQ", "TR.F.TOTASSETS"]:
+            return rng.lognormal(19, 1.5) * np.exp(np.cumsum(rng.normal(0.04, 0.1, n)))
+        if field in ["TR.F.EBIT", "TR.F.INTREXPN"]:
+            return rng.lognormal(16, 1.5) * rng.normal(1, 0.3, n)
+        return np.clip(rng.normal(55, 20) + np.cumsum(rng.normal(0, 4, n)), 0, 100)
+
+    def _synthetic_history(self, universe: list[str], fields: list[str], interval: str, start, end) -> pd.DataFrame:
+        start = self._as_timestamp(start, year_end=False)
+        end = min(self._as_timestamp(end, year_end=True), pd.Timestamp(datetime.today().date()))
+        dates = pd.date_range(max(start, pd.Timestamp(self.CALENDAR_START)), end, freq=self.INTERVAL_FREQ.get(interval, "B"), name="Date")
+        names = [self.FIELD_NAMES.get(field.upper(), field) for field in fields]
+        # values are drawn over a fixed calendar, so overlapping windows return the same value for the same day
+        calendar = pd.date_range(self.CALENDAR_START, datetime.today().date(), freq=self.INTERVAL_FREQ.get(interval, "B"))
+        rows = calendar.get_indexer(dates)
+        data = {
+            (ric, name): self._synthetic_values(ric, field.upper(), calendar)[rows] for ric in universe for field, name in zip(fields, names)
+        }
+        df = pd.DataFrame(data, index=dates)
+        # same column layout rules as the platform's history frame builder
+        if len(universe) == 1:
+            df.columns = pd.Index(names, name=universe[0])
+        elif len(fields) == 1:
+            df.columns = pd.Index(universe)
+        else:
+            df.columns = pd.MultiIndex.from_tuples(data.keys())
+        return df
@@ -0,0 +1,85 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+
+class ReturnPanel:
+    def __init__(
+        self,
+        start_date: datetime,
+        end_date: datetime,
+        dates: np.ndarray,
+        rics: list[str],
+        returns: np.ndarray,
+        valid: np.ndarray,
+        available: np.ndarray,
+    ):
+        # returns/valid are (dates x RICs) in fortran order, so every RIC column is one contiguous block
+        self.start_date = start_date
+        self.end_date = end_date
+        self.dates = dates
+        self.rics = rics
+        self.returns = returns
+        self.valid = valid
+        self.available = available
+        self.ric_positions: dict[str, int] = {ric: i for i, ric in enumerate(rics)}
+
+    def __contains__(self, RIC: str) -> bool:
+        return RIC in self.ric_positions
+
+    def __len__(self) -> int:
+        return len(self.rics)
+
+    def covers(self, RIC: str, start_date: datetime, end_date: datetime) -> bool:
+        return RIC in self.ric_positions and self.start_date <= start_date and end_date <= self.end_date
+
+    def column(self, RIC: str) -> tuple[np.ndarray, np.ndarray]:
+        i = self.ric_positions[RIC]
+        return self.returns[:, i], self.valid[:, i]
+
+    def daily_returns(
+        self,
+        RIC: str,
+        start_date: datetime,
+        end_date: datetime,
+        start_return_index: float = 100.0,
+    ) -> pd.DataFrame | None:
+        if not self.available[self.ric_positions[RIC]]:
+            return None
+        values, valid = self.column(RIC)
+        lo = np.searchsorted(self.dates, np.datetime64(start_date, "ns"), side="left")
+        hi = np.searchsorted(self.dates, np.datetime64(end_date, "ns"), side="right")
+        rows = np.flatnonzero(valid[lo:hi]) + lo
+        if 0 < len(rows) and rows[-1] - rows[0] + 1 == len(rows):
+            rows = slice(rows[0], rows[-1] + 1)
+        dates = pd.DatetimeIndex(self.dates[rows], name="date")
+        df = pd.DataFrame({"date": dates, "total_return": values[rows]}, index=dates, copy=False)
+        df.loc[:, "return_cumulative"] = df["total_return"].add(1).cumprod()
+        df.loc[:, "return_index"] = df["return_cumulative"] * start_return_index
+        return df
+
+    @staticmethod
+    def from_frames(start_date: datetime, end_date: datetime, frames: dict[str, pd.DataFrame | None]) -> "ReturnPanel":
+        rics = list(frames.keys())
+        date_values = [df["date"].to_numpy(dtype="datetime64[ns]") for df in frames.values() if df is not None]
+        dates = np.unique(np.concatenate(date_values)) if 0 < len(date_values) else np.array([], dtype="datetime64[ns]")
+        returns = np.full((len(dates), len(rics)), np.nan, dtype=np.float64, order="F")
+        valid = np.zeros((len(dates), len(rics)), dtype=bool, order="F")
+        available = np.zeros(len(rics), dtype=bool)
+        for i, df in enumerate(frames.values()):
+            if df is None:
+                continue
+            available[i] = True
+            rows = np.searchsorted(dates, df["date"].to_numpy(dtype="datetime64[ns]"))
+            returns[rows, i] = df["total_return"].to_numpy(dtype=np.float64)
+            valid[rows, i] = True
+        return ReturnPanel(
+            start_date=start_date,
+            end_date=end_date,
+            dates=dates,
+            rics=rics,
+            returns=returns,
+            valid=valid,
+            available=available,
+        )